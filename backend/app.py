@@ -13,10 +13,12 @@ from flask_cors import CORS
 from werkzeug.security import check_password_hash
 
 from backend.config import get_config
-from backend.database import init_db, get_db, close_db
+from backend.database import init_db, get_db, close_db, connect, pragma_report
 from backend.models import get_admin_by_email
+from backend.registry import registry
+from backend.bloom import batch_bloom
 from backend.routes.register import register_bp
-from backend.routes.verify import verify_bp
+from backend.routes.verify import verify_bp, verify_api_bp
 from backend.routes.report import report_bp
 
 # Optional admin blueprint
@@ -70,6 +72,20 @@ def create_app() -> Flask:
     # Initialize database
     init_db()
 
+    # Report the effective SQLite profile for this node
+    conn = connect()
+    app.logger.info("SQLite PRAGMAs for %s: %s",
+                    cfg.DB_PATH, pragma_report(conn))
+    conn.close()
+
+    # Build (or adopt) the shared registry snapshot
+    if registry is not None:
+        registry.build()
+
+    # Load the Bloom filter of registered batches
+    if batch_bloom is not None:
+        batch_bloom.build()
+
     # ✅ Ensure DB connections are closed after each request
     @app.teardown_appcontext
     def teardown_db(exception):
@@ -82,9 +98,18 @@ def create_app() -> Flask:
         if not session.get("admin_id") or session.get("admin_role") != "regulator":
             return redirect(url_for("admin_login"))
 
-    # Track last activity for inactivity timeout
+    # Track last activity for inactivity timeout (admin sessions only, so
+    # public verify responses stay cookie-free and cacheable)
     @app.before_request
     def check_session_timeout():
+        if "admin_id" not in session:
+            return
+        # The live event stream reconnects on its own; it must not keep
+        # an idle session alive
+        if request.endpoint == "admin_api.admin_events":
+            if time.time() - session.get("last_activity", 0) > 300:
+                abort(401)
+            return
         if "last_activity" in session:
             now = time.time()
             last = session["last_activity"]
@@ -150,6 +175,7 @@ def create_app() -> Flask:
     # Register API blueprints
     app.register_blueprint(register_bp, url_prefix="/api")
     app.register_blueprint(report_bp, url_prefix="/api")
+    app.register_blueprint(verify_api_bp, url_prefix="/api")
 
     # Register verify_bp with /verify prefix for public access (non-API)
     app.register_blueprint(verify_bp, url_prefix="/verify")
@@ -0,0 +1,196 @@
+"""
+Bloom filter over registered batch keys.
+
+Lets the verify path reject batches that were never registered without
+touching the registry snapshot or SQLite. The filter is per process and
+tied to the shared registry generation: if another worker has written
+since the filter was built, it stops answering until it is rebuilt.
+Without the registry there is no shared generation, so no filter is
+built: a "not registered" answer from one worker could go stale the
+moment another registers the batch.
+"""
+
+import hashlib
+import math
+import threading
+from pathlib import Path
+from backend.config import get_config
+from backend.database import connect
+from backend.registry import registry
+
+# Load configuration
+cfg = get_config()
+
+
+class BloomFilter:
+    """
+    Plain bit-array Bloom filter using double hashing.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(
+            8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(
+            1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7))
+                   for pos in self._positions(key))
+
+    @property
+    def estimated_fpr(self) -> float:
+        """
+        Expected false-positive rate for the number of keys added so far.
+        """
+        k = self.num_hashes
+        return (1 - math.exp(-k * self.count / self.num_bits)) ** k
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class BatchBloom:
+    """
+    Process-wide filter of registered batch keys, rebuilt from `drugs`
+    at startup, when it falls behind the registry generation, and when
+    its estimated false-positive rate drifts past twice the target.
+    """
+
+    def __init__(self, db_path: Path, error_rate: float,
+                 min_capacity: int, counter=None):
+        self.db_path = Path(db_path)
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self.counter = counter
+        self.filter = None
+        self.generation = None
+        self._lock = threading.Lock()
+        self._rebuilding = threading.Lock()
+        self.rejections = 0
+        self.passes = 0
+        self.stale_checks = 0
+        self.rebuilds = 0
+
+    def _current_generation(self):
+        return self.counter.value() if self.counter is not None else None
+
+    def build(self):
+        generation = self._current_generation()
+        conn = connect(self.db_path)
+        try:
+            keys = [r[0] for r in conn.execute(
+                "SELECT batch_key FROM drugs WHERE batch_key IS NOT NULL")]
+        finally:
+            conn.close()
+
+        bloom = BloomFilter(
+            max(self.min_capacity, len(keys) * 2), self.error_rate)
+        for key in keys:
+            bloom.add(key)
+        with self._lock:
+            self.filter = bloom
+            self.generation = generation
+        self.rebuilds += 1
+
+    def schedule_rebuild(self):
+        if not self._rebuilding.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.build()
+            except Exception as e:
+                print("Bloom filter rebuild failed:", e)
+            finally:
+                self._rebuilding.release()
+
+        threading.Thread(target=run, name="bloom-rebuild",
+                         daemon=True).start()
+
+    def add(self, key: str, generation=None):
+        """
+        Record a batch written by this process. `generation` is the
+        registry generation produced by that write; if anything else was
+        written in between, the filter is rebuilt instead of advanced.
+        """
+        with self._lock:
+            if self.filter is None:
+                return
+            self.filter.add(key)
+            drifted = self.filter.estimated_fpr > 2 * self.error_rate
+            if generation is not None:
+                if (self.generation is not None
+                        and generation == self.generation + 1):
+                    self.generation = generation
+                else:
+                    drifted = True
+        if drifted:
+            self.schedule_rebuild()
+
+    def definitely_absent(self, key: str) -> bool:
+        """
+        True only when the batch is certainly not registered.
+        """
+        bloom = self.filter
+        if bloom is None:
+            return False
+        if self.generation != self._current_generation():
+            self.stale_checks += 1
+            self.schedule_rebuild()
+            return False
+        if key in bloom:
+            self.passes += 1
+            return False
+        self.rejections += 1
+        return True
+
+    def stats(self) -> dict:
+        bloom = self.filter
+        if bloom is None:
+            return {"enabled": True, "built": False}
+        return {
+            "enabled": True,
+            "built": True,
+            "keys": bloom.count,
+            "capacity": bloom.capacity,
+            "num_bits": bloom.num_bits,
+            "num_hashes": bloom.num_hashes,
+            "memory_bytes": bloom.nbytes,
+            "target_fpr": self.error_rate,
+            "estimated_fpr": round(bloom.estimated_fpr, 6),
+            "generation": self.generation,
+            "rejections": self.rejections,
+            "passes": self.passes,
+            "stale_checks": self.stale_checks,
+            "rebuilds": self.rebuilds,
+        }
+
+
+# Process-wide filter consulted before any other lookup; only with the
+# registry, whose counter tells every worker when to rebuild
+batch_bloom = (
+    BatchBloom(
+        cfg.DB_PATH, cfg.BLOOM_ERROR_RATE, cfg.BLOOM_MIN_CAPACITY,
+        counter=registry.counter,
+    )
+    if cfg.BLOOM_ENABLED and registry is not None else None
+)
@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import OrderedDict
+from backend.config import get_config
+
+# Load configuration
+cfg = get_config()
+
+# Sentinel returned by BatchCache.get() when nothing usable is cached
+MISS = object()
+
+
+class BatchCache:
+    """
+    Bounded in-process LRU cache for batch lookups.
+    Stores found rows (dicts) and not-found results (None) with a TTL.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    def get(self, key, generation=None):
+        """
+        Return the cached value for `key` (a row dict or None for a
+        known-missing batch), or MISS if absent or expired.
+        Negative entries recorded under another registry generation are
+        treated as expired, since another worker may have added the batch.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISS
+            value, expires_at, entry_generation = entry
+            if expires_at <= now or (
+                    value is None and entry_generation != generation):
+                del self._data[key]
+                self.misses += 1
+                return MISS
+            self._data.move_to_end(key)
+            self.hits += 1
+            if value is None:
+                self.negative_hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        """
+        Cache a lookup result. `None` records a not-found batch.
+        """
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl, generation)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "negative_ttl": self.negative_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "negative_hits": self.negative_hits,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class FragmentCache:
+    """
+    LRU cache of rendered HTML, bounded by total encoded size in bytes.
+    Each key holds one fragment tagged with a `variant` (e.g. status and
+    day); a lookup with a different variant is a miss.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (variant, html, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, variant):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != variant:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, variant, html: str):
+        size = len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._data[key] = (variant, html, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _key, (_variant, _html, evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Process-wide cache used by the verify path
+batch_cache = BatchCache(
+    max_size=cfg.BATCH_CACHE_SIZE,
+    ttl=cfg.BATCH_CACHE_TTL,
+    negative_ttl=cfg.BATCH_CACHE_NEGATIVE_TTL,
+)
+
+# Rendered verify.html bodies, keyed by batch key
+verify_page_cache = FragmentCache(max_bytes=cfg.VERIFY_PAGE_CACHE_BYTES)
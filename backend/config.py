@@ -4,6 +4,15 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent  # Points to MEDGuard/
 
 
+def _db_pragmas(**defaults) -> dict:
+    """
+    SQLite PRAGMA profile. Each value can be overridden per node with an
+    environment variable named DB_<PRAGMA>, e.g. DB_CACHE_SIZE=-200000.
+    """
+    return {name: os.getenv(f"DB_{name.upper()}", str(value))
+            for name, value in defaults.items()}
+
+
 class Config:
     # App
     APP_NAME: str = "MedGuard"
@@ -15,6 +24,131 @@ class Config:
 
     # Database
     DB_PATH: Path = Path(os.getenv("DB_PATH", BASE_DIR / "medguard.db"))
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "8"))
+    # Applied to every connection by database.connect(); order matters
+    # (journal_mode first). Negative cache_size is in KiB.
+    DB_PRAGMAS: dict = _db_pragmas(
+        journal_mode="WAL",
+        synchronous="NORMAL",     # safe with WAL; FULL fsyncs every commit
+                                  # (the writer uses FULL for durable intake)
+        cache_size=-16000,        # ~16 MB page cache per connection
+        mmap_size=64 * 1024 * 1024,
+        temp_store="MEMORY",
+        busy_timeout=10000,       # ms to wait on a locked database
+        wal_autocheckpoint=1000,  # pages
+    )
+    # Idle seconds after which a pooled connection is pinged before reuse
+    DB_POOL_HEALTHCHECK_AFTER: float = float(
+        os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30"))
+    # Read-only connections for GET/HEAD requests (per process), and
+    # whether each read request runs in one deferred-transaction snapshot
+    DB_READ_POOL_SIZE: int = int(os.getenv("DB_READ_POOL_SIZE", "16"))
+    DB_READ_SNAPSHOT: bool = os.getenv(
+        "DB_READ_SNAPSHOT", "false").lower() == "true"
+
+    # Schema migrations: rows per backfill chunk, pause between chunks (s)
+    MIGRATION_BATCH_SIZE: int = int(os.getenv("MIGRATION_BATCH_SIZE", "500"))
+    MIGRATION_BATCH_PAUSE: float = float(
+        os.getenv("MIGRATION_BATCH_PAUSE", "0.01"))
+
+    # Batch lookup cache (per process)
+    BATCH_CACHE_SIZE: int = int(os.getenv("BATCH_CACHE_SIZE", "10000"))
+    BATCH_CACHE_TTL: float = float(os.getenv("BATCH_CACHE_TTL", "300"))
+    BATCH_CACHE_NEGATIVE_TTL: float = float(
+        os.getenv("BATCH_CACHE_NEGATIVE_TTL", "30"))
+
+    # Rendered verify page cache (per process), in bytes
+    VERIFY_PAGE_CACHE_BYTES: int = int(
+        os.getenv("VERIFY_PAGE_CACHE_BYTES", str(8 * 1024 * 1024)))
+
+    # Shared registry index (mmap'd by every worker)
+    REGISTRY_ENABLED: bool = os.getenv(
+        "REGISTRY_ENABLED", "true").lower() == "true"
+    REGISTRY_PATH: Path = Path(
+        os.getenv("REGISTRY_PATH", f"{DB_PATH}.registry"))
+
+    # Bloom filter for fast rejection of unregistered batches (needs the
+    # registry above; off without it)
+    BLOOM_ENABLED: bool = os.getenv("BLOOM_ENABLED", "true").lower() == "true"
+    BLOOM_ERROR_RATE: float = float(os.getenv("BLOOM_ERROR_RATE", "0.01"))
+    BLOOM_MIN_CAPACITY: int = int(os.getenv("BLOOM_MIN_CAPACITY", "10000"))
+
+    # HTTP caching for the JSON verify API (seconds)
+    VERIFY_MAX_AGE: int = int(os.getenv("VERIFY_MAX_AGE", "3600"))
+    VERIFY_NOTFOUND_MAX_AGE: int = int(
+        os.getenv("VERIFY_NOTFOUND_MAX_AGE", "60"))
+
+    # Bulk verification (POST /api/verify/bulk)
+    VERIFY_BULK_MAX: int = int(os.getenv("VERIFY_BULK_MAX", "10000"))
+    VERIFY_BULK_CHUNK: int = int(os.getenv("VERIFY_BULK_CHUNK", "500"))
+
+    # Single-writer executor (see backend/writer.py): queue bound, jobs per
+    # transaction, how long to wait for a group to fill (ms), how long
+    # callers wait for a result (s), and backoff once busy_timeout expires
+    WRITE_QUEUE_SIZE: int = int(os.getenv("WRITE_QUEUE_SIZE", "1000"))
+    WRITE_BATCH_SIZE: int = int(os.getenv("WRITE_BATCH_SIZE", "100"))
+    # A group takes whatever is already queued; waiting for more only pays
+    # off with many concurrent writers. Under gunicorn sync/gthread
+    # workers a process has at most `threads` requests, so durable intake
+    # would mostly wait the full interval for 1-job groups. Raise it for
+    # "fast" intake under heavy load.
+    WRITE_BATCH_WAIT_MS: float = float(os.getenv("WRITE_BATCH_WAIT_MS", "0"))
+    WRITE_TIMEOUT: float = float(os.getenv("WRITE_TIMEOUT", "30"))
+    WRITE_LOCK_RETRIES: int = int(os.getenv("WRITE_LOCK_RETRIES", "4"))
+    # Total time a group may spend waiting for the write lock (s), however
+    # many retries that allows. Keep it well below WRITE_TIMEOUT, or callers
+    # give up on groups that are still only waiting for the lock.
+    WRITE_LOCK_BUDGET: float = float(os.getenv("WRITE_LOCK_BUDGET", "15"))
+    WRITE_BACKOFF_BASE: float = float(os.getenv("WRITE_BACKOFF_BASE", "0.05"))
+    WRITE_BACKOFF_MAX: float = float(os.getenv("WRITE_BACKOFF_MAX", "1.0"))
+
+    # Report intake. "durable" waits for the report's group to commit
+    # (fsynced: the writer runs with synchronous=FULL) before answering;
+    # "fast" answers once it is queued.
+    REPORT_INTAKE_MODE: str = os.getenv("REPORT_INTAKE_MODE", "durable")
+    REPORT_ACK_TIMEOUT: float = float(os.getenv("REPORT_ACK_TIMEOUT", "5"))
+    REPORT_RETRY_AFTER: int = int(os.getenv("REPORT_RETRY_AFTER", "2"))
+    # Reports flipped New -> Checked per writer job after a regulator
+    # views the reports page
+    ACK_BATCH_SIZE: int = int(os.getenv("ACK_BATCH_SIZE", "500"))
+
+    # Repeat submissions of the same (batch, location, client) within
+    # REPORT_DEDUP_WINDOW seconds: "fold" into the original report's
+    # duplicate_count, "reject" with 429, or "off"
+    REPORT_DEDUP_MODE: str = os.getenv("REPORT_DEDUP_MODE", "fold")
+    REPORT_DEDUP_WINDOW: float = float(os.getenv("REPORT_DEDUP_WINDOW", "60"))
+    REPORT_DEDUP_MAX_KEYS: int = int(os.getenv("REPORT_DEDUP_MAX_KEYS", "10000"))
+
+    # Hotspots: a (batch, location) pair is spiking when its window count
+    # is HOTSPOT_SPIKE_RATIO x its average over the previous windows
+    HOTSPOT_BASELINE_WINDOWS: int = int(os.getenv("HOTSPOT_BASELINE_WINDOWS", "7"))
+    HOTSPOT_SPIKE_RATIO: float = float(os.getenv("HOTSPOT_SPIKE_RATIO", "3"))
+    HOTSPOT_MIN_REPORTS: int = int(os.getenv("HOTSPOT_MIN_REPORTS", "3"))
+    HOTSPOT_TOP_MAX: int = int(os.getenv("HOTSPOT_TOP_MAX", "100"))
+
+    # Keyset pagination: default and maximum rows per page (?limit=)
+    PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+    PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+    # Exports (see backend/exports.py): rows per fetchmany(), rows
+    # per PDF table (about one page), rows per PDF part (one ReportLab
+    # document in memory at a time), bytes kept in memory before the
+    # output spills to disk, and response block size
+    EXPORT_CHUNK_SIZE: int = int(os.getenv("EXPORT_CHUNK_SIZE", "500"))
+    EXPORT_PDF_ROWS_PER_TABLE: int = int(os.getenv("EXPORT_PDF_ROWS_PER_TABLE", "30"))
+    EXPORT_PDF_ROWS_PER_PART: int = int(os.getenv("EXPORT_PDF_ROWS_PER_PART", "600"))
+    EXPORT_SPOOL_MAX: int = int(os.getenv("EXPORT_SPOOL_MAX", str(8 * 1024 * 1024)))
+    EXPORT_STREAM_BLOCK: int = int(os.getenv("EXPORT_STREAM_BLOCK", str(64 * 1024)))
+    # zlib level for ?gzip=1 CSV / NDJSON dumps
+    EXPORT_GZIP_LEVEL: int = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+    # Admin live updates (GET /admin/events, Server-Sent Events): stream
+    # lifetime before the browser reconnects, how often to check for
+    # changes, reconnect delay, and idle keep-alive interval
+    SSE_MAX_SECONDS: float = float(os.getenv("SSE_MAX_SECONDS", "55"))
+    SSE_POLL_INTERVAL: float = float(os.getenv("SSE_POLL_INTERVAL", "0.5"))
+    SSE_RETRY_MS: int = int(os.getenv("SSE_RETRY_MS", "3000"))
+    SSE_KEEPALIVE: float = float(os.getenv("SSE_KEEPALIVE", "15"))
 
     # Security (QR signing, etc.)
     QR_SIGNING_SECRET: str = os.getenv(
@@ -38,6 +172,16 @@ class ProdConfig(Config):
         "CORS_ORIGINS", "https://your-domain.com").split(",")  # List
     # Enforce environment variable in prod
     SECRET_KEY = os.getenv("SECRET_KEY")
+    # Larger page cache and memory map for read-heavy verify traffic
+    DB_PRAGMAS = _db_pragmas(
+        journal_mode="WAL",
+        synchronous="NORMAL",
+        cache_size=-64000,
+        mmap_size=256 * 1024 * 1024,
+        temp_store="MEMORY",
+        busy_timeout=5000,
+        wal_autocheckpoint=1000,
+    )
 
 
 def get_config():
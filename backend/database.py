@@ -1,29 +1,234 @@
+import os
+import re
 import sqlite3
-from flask import g
+import threading
+import time
+from pathlib import Path
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_request_context, request
 from backend.config import get_config
 from werkzeug.security import generate_password_hash
 
+try:
+    import fcntl  # POSIX only; FileLock is a no-op without it
+except ImportError:
+    fcntl = None
+
 # Load configuration
 cfg = get_config()
 
 
+def normalize_batch_key(batch_number) -> str:
+    """
+    Canonical form of a batch number used for lookups: all whitespace
+    removed and upper-cased, so ' ab 12 ' and 'AB12' are the same batch.
+    """
+    return "".join(str(batch_number or "").split()).upper()
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a side file (no-op without fcntl).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fh = None
+
+    def __enter__(self):
+        self._fh = open(self.path, "a+b")
+        if fcntl:
+            fcntl.flock(self._fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+        self._fh.close()
+        self._fh = None
+
+
+def configure_connection(conn, pragmas=None):
+    """
+    Apply the configured PRAGMA profile (Config.DB_PRAGMAS) to a connection.
+    """
+    for name, value in (pragmas or cfg.DB_PRAGMAS).items():
+        if not re.fullmatch(r"[A-Za-z_]+", name) or not re.fullmatch(r"-?\w+", str(value)):
+            raise ValueError(f"Invalid PRAGMA setting: {name}={value!r}")
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def connect(db_path=None, readonly=False, **kwargs):
+    """
+    Open a configured connection outside of a request (init, scripts,
+    background builders). Extra kwargs go to sqlite3.connect.
+    With readonly=True the file is opened `mode=ro` and the connection is
+    marked query_only, so it can never take a write lock.
+    """
+    busy_timeout = int(cfg.DB_PRAGMAS.get("busy_timeout", 10000))
+    kwargs.setdefault("timeout", busy_timeout / 1000)
+    db_path = db_path or cfg.DB_PATH
+    if not readonly:
+        conn = sqlite3.connect(db_path, **kwargs)
+        return configure_connection(conn)
+
+    uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, **kwargs)
+    # journal_mode is a property of the database file; the writer sets it
+    configure_connection(conn, {name: value for name, value in cfg.DB_PRAGMAS.items()
+                                if name != "journal_mode"})
+    conn.execute("PRAGMA query_only=1")
+    return conn
+
+
+def pragma_report(conn) -> dict:
+    """
+    Effective values of the configured PRAGMAs on `conn`.
+    """
+    return {name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+            for name in cfg.DB_PRAGMAS}
+
+
+def _new_connection(readonly=False):
+    """
+    Open a request connection with the configured PRAGMA profile
+    (WAL, busy timeout, cache sizes, ...).
+    """
+    conn = connect(
+        readonly=readonly,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False  # pooled; used by one thread at a time
+    )
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _new_readonly_connection():
+    return _new_connection(readonly=True)
+
+
+class ConnectionPool:
+    """
+    Per-process pool of configured SQLite connections.
+    Connections are set up once, handed out LIFO (the warmest first),
+    health-checked after sitting idle, and reset on return.
+    """
+
+    def __init__(self, factory, max_size: int, healthcheck_after: float):
+        self.factory = factory
+        self.max_size = max_size
+        self.healthcheck_after = healthcheck_after
+        self._idle = []  # (conn, returned_at)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.in_use = 0
+
+    def _reset_after_fork(self):
+        # Never share SQLite handles with a forked worker
+        if self._pid != os.getpid():
+            self._idle = []
+            self._pid = os.getpid()
+            self.in_use = 0
+
+    def acquire(self):
+        with self._lock:
+            self._reset_after_fork()
+            while self._idle:
+                conn, returned_at = self._idle.pop()
+                if time.monotonic() - returned_at >= self.healthcheck_after:
+                    try:
+                        conn.execute("SELECT 1").fetchone()
+                    except sqlite3.Error:
+                        self.discarded += 1
+                        continue
+                self.reused += 1
+                self.in_use += 1
+                return conn
+            self.created += 1
+            self.in_use += 1
+        return self.factory()
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            with self._lock:
+                self.in_use -= 1
+                self.discarded += 1
+            conn.close()
+            return
+
+        with self._lock:
+            self.in_use -= 1
+            if self._pid == os.getpid() and len(self._idle) < self.max_size:
+                self._idle.append((conn, time.monotonic()))
+                return
+            self.discarded += 1
+        conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "in_use": self.in_use,
+                "max_idle": self.max_size,
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+            }
+
+
+# Request connections for this worker: read-write for requests that may
+# write, read-only (mode=ro, query_only) for reads
+pool = ConnectionPool(_new_connection, cfg.DB_POOL_SIZE,
+                      cfg.DB_POOL_HEALTHCHECK_AFTER)
+read_pool = ConnectionPool(_new_readonly_connection, cfg.DB_READ_POOL_SIZE,
+                           cfg.DB_POOL_HEALTHCHECK_AFTER)
+
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+
+def read_only(view):
+    """
+    Mark a non-GET view that only reads (e.g. bulk verification via POST)
+    so get_db() hands it a read-only connection.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _wants_read_only() -> bool:
+    if not has_request_context():
+        return False
+    return g.get("db_read_only", request.method in READ_METHODS)
+
+
 def get_db():
     """
-    Get a database connection with timeout and WAL mode enabled.
+    Get a pooled database connection for the current request.
     Uses Flask's `g` to reuse the same connection per request.
+    GET/HEAD requests (and views marked @read_only) get a read-only
+    connection; with DB_READ_SNAPSHOT it also opens a deferred transaction,
+    so every query in the request sees the same snapshot. Writes go through
+    backend.writer either way.
     """
+    if _wants_read_only():
+        if "db_ro" not in g:
+            g.db_ro = read_pool.acquire()
+            if cfg.DB_READ_SNAPSHOT:
+                g.db_ro.execute("BEGIN DEFERRED")
+        return g.db_ro
     if "db" not in g:
-        conn = sqlite3.connect(
-            cfg.DB_PATH,
-            detect_types=sqlite3.PARSE_DECLTYPES,
-            timeout=10  # ✅ wait up to 10s before giving up
-        )
-        conn.row_factory = sqlite3.Row
-
-        # ✅ Enable WAL mode for better concurrency
-        conn.execute("PRAGMA journal_mode=WAL;")
-
-        g.db = conn
+        g.db = pool.acquire()
     return g.db
 
 
@@ -32,60 +237,53 @@ def get_conn():
     return get_db()
 
 
+@contextmanager
+def read_snapshot():
+    """
+    Run several queries against one consistent snapshot:
+
+        with read_snapshot() as conn:
+            total = conn.execute("SELECT COUNT(*) ...").fetchone()[0]
+            rows = conn.execute("SELECT ... LIMIT ?", ...).fetchall()
+
+    Opens a deferred transaction on the request's connection (a no-op if
+    one is already open, e.g. under DB_READ_SNAPSHOT) and ends it on exit.
+    """
+    conn = get_db()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN DEFERRED")
+    try:
+        yield conn
+    finally:
+        conn.rollback()  # read-only: nothing to keep
+
+
 def close_db(e=None):
     """
-    Close the database connection at the end of the request.
+    Return the request's connections to their pools at the end of the
+    request.
     """
     db = g.pop("db", None)
     if db is not None:
-        db.close()
+        pool.release(db)
+    db = g.pop("db_ro", None)
+    if db is not None:
+        read_pool.release(db)
 
 
 def init_db():
     """
-    Initialize the database tables if they don't exist.
-    Ensures 'drugs', 'reports', and 'admin_users' tables are created with the correct schema.
-    Adds a default admin user if none exist.
+    Bring the schema up to date (see backend.migrations) and add a
+    default admin user if none exist. Cheap once the schema is current.
     """
-    conn = sqlite3.connect(cfg.DB_PATH)
-    c = conn.cursor()
+    # Imported here: migrations builds on the helpers in this module
+    from backend.migrations import migrate
+    migrate()
 
-    # Create drugs table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS drugs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            batch_number TEXT UNIQUE NOT NULL,
-            mfg_date TEXT NOT NULL,
-            expiry_date TEXT NOT NULL,
-            manufacturer TEXT NOT NULL,
-            created_at TEXT DEFAULT (datetime('now'))
-        )
-    """)
-
-    # Create reports table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS reports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            drug_name TEXT,
-            batch_number TEXT NOT NULL,
-            location TEXT,
-            note TEXT,
-            reported_on TIMESTAMP DEFAULT (datetime('now')),
-            status INTEGER DEFAULT 0
-        )
-    """)
-
-    # Create admin_users table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS admin_users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            is_verified INTEGER DEFAULT 0,
-            role TEXT NOT NULL
-        )
-    """)
+    conn = connect()
+    c = conn.cursor()
 
     # Add default admin user if table is empty
     c.execute("SELECT COUNT(*) FROM admin_users")
@@ -104,3 +302,6 @@ if __name__ == "__main__":
     print(f"Initializing database at: {cfg.DB_PATH}")
     init_db()
     print("✅ Database initialized successfully with clean schema.")
+    conn = connect()
+    print(f"SQLite PRAGMAs: {pragma_report(conn)}")
+    conn.close()
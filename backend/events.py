@@ -0,0 +1,55 @@
+"""
+Cross-worker change notifications for the admin dashboard.
+
+Whenever a write to `reports` commits, the writer bumps a shared counter
+(a tiny mmap'd file, see registry.SharedCounter). Every worker's
+Server-Sent Events streams watch that counter with plain memory reads and
+only touch the database when it moves, so idle dashboards cost nothing
+and a new report reaches every open dashboard, whichever worker it
+landed on.
+"""
+
+import json
+from pathlib import Path
+from backend.config import get_config
+from backend.database import fcntl
+from backend.registry import SharedCounter
+
+# Load configuration
+cfg = get_config()
+
+# None without file locking; streams then poll report_counters instead
+report_events = (
+    SharedCounter(Path(f"{cfg.DB_PATH}.events")) if fcntl is not None else None
+)
+
+
+def reports_changed(future=None):
+    """
+    Tell every worker that `reports` changed. Usable as a Future done
+    callback: failed writes are not announced.
+    """
+    if report_events is None:
+        return
+    if future is not None and (future.cancelled() or future.exception()):
+        return
+    report_events.increment()
+
+
+def reports_generation() -> int:
+    return report_events.value() if report_events is not None else 0
+
+
+def sse_message(event: str, data, event_id=None, retry_ms=None) -> str:
+    """
+    Format one Server-Sent Events message.
+    """
+    lines = []
+    if retry_ms is not None:
+        lines.append(f"retry: {int(retry_ms)}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in
+                 json.dumps(data, default=str).splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,499 @@
+"""
+Bulk exports of registered drugs and reports.
+
+Exports never hold the whole result set: rows are read from the cursor
+EXPORT_CHUNK_SIZE at a time and turned into output as they arrive.
+
+ReportLab keeps every page of a document in memory until it is saved, so
+the PDF is built as separate documents of EXPORT_PDF_ROWS_PER_PART rows
+each, laid out in page-sized tables. Each part's objects are copied into
+the output renumbered, and its pages are added to one page tree. Memory
+per export is then one part plus a few integers per page. The output
+goes to a spooled temporary file (in memory up to EXPORT_SPOOL_MAX
+bytes, then on disk), which the response streams out in blocks. A part
+starts on a new page, so the last page of each part may be short.
+
+The Word export builds only the document skeleton with python-docx: a
+table holding the header and one placeholder row. The saved
+document.xml is cut around that row and the data rows are written
+between the two halves as text, from the placeholder row's markup, with
+the same run content python-docx's cell.text would produce.
+
+CSV and NDJSON dumps are generators over the cursor, one encoded block
+per fetched chunk, optionally gzip-compressed as they go, so the
+response streams with constant memory.
+"""
+
+import csv
+import io
+import json
+import re
+import zipfile
+import zlib
+from datetime import date, timedelta
+from itertools import islice
+from tempfile import SpooledTemporaryFile
+from docx import Document
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from backend.config import get_config
+
+# Load configuration
+cfg = get_config()
+
+DRUG_EXPORT_FIELDS = "name, batch_number, manufacturer, mfg_date, expiry_date, expiry_on, created_at"
+DRUG_EXPORT_HEADER = ["Name", "Batch Number", "Manufacturer",
+                      "Mfg Date", "Expiry Date", "Status", "Registered On"]
+
+# Machine-readable dumps: (SELECT list, column names)
+DRUG_DUMP_FIELDS = (
+    "drugs.id, name, batch_number, batch_key, manufacturer, mfg_date,"
+    " expiry_date, expiry_on, created_at",
+    ["id", "name", "batch_number", "batch_key", "manufacturer", "mfg_date",
+     "expiry_date", "expiry_on", "created_at"],
+)
+REPORT_DUMP_FIELDS = (
+    "reports.id, drug_name, batch_number, batch_key, location, note,"
+    " strftime('%Y-%m-%d %H:%M:%S', reported_on) AS reported_on, status,"
+    " duplicate_count",
+    ["id", "drug_name", "batch_number", "batch_key", "location", "note",
+     "reported_on", "status", "duplicate_count"],
+)
+
+DUMP_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+# PDF table fonts (name, size) and cell padding (ReportLab's default
+# 6pt left and right)
+PDF_HEADER_FONT = ("Helvetica-Bold", 9)
+PDF_BODY_FONT = ("Helvetica", 8)
+PDF_CELL_PADDING = 12
+PDF_FRAME_WIDTH = 468  # letter minus SimpleDocTemplate's 1in margins
+
+# Widest value of the columns with a fixed format (dates, status)
+PDF_FIXED_SAMPLES = {3: "0000-00-00", 4: "0000-00-00",
+                     5: "Expiring Soon", 6: "0000-00-00 00:00:00"}
+
+
+def _pdf_col_widths():
+    """
+    Every column fits its title. Fixed-format columns are as wide as their
+    widest value; the free-text columns share what is left of the frame
+    evenly, and their cells wrap. The same widths on every page keep the
+    tables lined up.
+    """
+    widths = [stringWidth(title, *PDF_HEADER_FONT) + PDF_CELL_PADDING
+              for title in DRUG_EXPORT_HEADER]
+    for i, sample in PDF_FIXED_SAMPLES.items():
+        widths[i] = max(widths[i],
+                        stringWidth(sample, *PDF_BODY_FONT) + PDF_CELL_PADDING)
+    free = [i for i in range(len(widths)) if i not in PDF_FIXED_SAMPLES]
+    share = (PDF_FRAME_WIDTH - sum(widths)) / len(free)
+    for i in free:
+        widths[i] += share
+    return widths
+
+
+PDF_COL_WIDTHS = _pdf_col_widths()
+PDF_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f4f4f4")),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
+    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ("FONTNAME", (0, 0), (-1, 0), PDF_HEADER_FONT[0]),
+    ("FONTSIZE", (0, 0), (-1, 0), PDF_HEADER_FONT[1]),
+    ("FONTNAME", (0, 1), (-1, -1), PDF_BODY_FONT[0]),
+    ("FONTSIZE", (0, 1), (-1, -1), PDF_BODY_FONT[1]),
+    ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+    ("BOX", (0, 0), (-1, -1), 1, colors.black),
+])
+
+
+def expiry_label(expiry_on, today_iso, soon_iso):
+    """
+    Status label for exports, using the normalized expiry date.
+    """
+    if expiry_on and expiry_on < today_iso:
+        return "Expired"
+    if expiry_on and expiry_on <= soon_iso:
+        return "Expiring Soon"
+    return "Valid"
+
+
+def fetch_chunks(cursor, size=None):
+    """
+    Yield lists of at most `size` rows from `cursor` until it is drained.
+    """
+    size = size or cfg.EXPORT_CHUNK_SIZE
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+def drug_export_rows(conn, base_query, params, order):
+    """
+    Yield one list per drug, in DRUG_EXPORT_HEADER order, for the filters
+    from routes.admin._drug_filters. Values are as stored (None included).
+    """
+    today = date.today().isoformat()
+    soon = (date.today() + timedelta(days=30)).isoformat()
+    cursor = conn.execute(
+        f"SELECT {DRUG_EXPORT_FIELDS} {base_query} {order}", params)
+    for rows in fetch_chunks(cursor):
+        for row in rows:
+            yield [row["name"], row["batch_number"], row["manufacturer"],
+                   row["mfg_date"], row["expiry_date"],
+                   expiry_label(row["expiry_on"], today, soon),
+                   row["created_at"]]
+
+
+def _pdf_cell(value, font, width):
+    """
+    Cell text for `value` that fits `width` points: wrapped at spaces,
+    and between characters where a word alone is too wide.
+    """
+    if value is None:
+        return None
+    text = str(value)
+    if stringWidth(text, *font) <= width:
+        return text
+    lines = []
+    for line in simpleSplit(text, font[0], font[1], width):
+        while len(line) > 1 and stringWidth(line, *font) > width:
+            cut = len(line) - 1
+            while cut > 1 and stringWidth(line[:cut], *font) > width:
+                cut -= 1
+            lines.append(line[:cut])
+            line = line[cut:]
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _pdf_row(row, font):
+    return [_pdf_cell(value, font, width - PDF_CELL_PADDING)
+            for value, width in zip(row, PDF_COL_WIDTHS)]
+
+
+def _pdf_tables(rows, rows_per_table):
+    header = _pdf_row(DRUG_EXPORT_HEADER, PDF_HEADER_FONT)
+    rows = iter(rows)
+    while True:
+        chunk = [_pdf_row(row, PDF_BODY_FONT)
+                 for row in islice(rows, rows_per_table)]
+        if not chunk:
+            return
+        yield Table([header] + chunk, colWidths=PDF_COL_WIDTHS,
+                    repeatRows=1, style=PDF_TABLE_STYLE)
+
+
+_PDF_REF = re.compile(rb"\b(\d+) 0 R\b")
+_PDF_XREF_ENTRY = re.compile(rb"(\d{10}) \d{5} ([nf])")
+
+
+class _PdfJoin:
+    """
+    One PDF written from several ReportLab documents (classic xref table,
+    no object streams), part by part. Each part's objects are copied out
+    renumbered, except its catalog and page tree; its pages go under one
+    page tree written at the end. Only object offsets and page numbers
+    are kept between parts.
+    """
+
+    def __init__(self, fileobj):
+        self._out = fileobj
+        self._pos = 0
+        self._offsets = [0, 0, 0]  # 1: catalog, 2: page tree (written last)
+        self._kids = []
+        self._info = None
+        self._write(b"%PDF-1.4\n%\x93\x8c\x8b\x9e\n")
+
+    def _write(self, data):
+        self._out.write(data)
+        self._pos += len(data)
+
+    def _object(self, num, body):
+        self._offsets[num] = self._pos
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (num, body))
+
+    def add(self, pdf: bytes):
+        """
+        Append the pages of the complete PDF document `pdf`.
+        """
+        xref = int(pdf[pdf.rindex(b"startxref") + 9:].split()[0])
+        entries = _PDF_XREF_ENTRY.findall(pdf, xref, pdf.index(b"trailer", xref))
+        trailer = pdf[pdf.index(b"trailer", xref):]
+        root = int(re.search(rb"/Root (\d+) 0 R", trailer).group(1))
+        info = int(re.search(rb"/Info (\d+) 0 R", trailer).group(1))
+
+        # Object number -> body, each running to the next object's offset
+        spans = sorted((int(offset), num) for num, (offset, kind)
+                       in enumerate(entries) if kind == b"n")
+        bodies = {}
+        for (start, num), end in zip(spans, [s for s, _ in spans[1:]] + [xref]):
+            body = pdf[start:end]
+            body = body[body.index(b"obj") + 3:body.rindex(b"endobj")]
+            bodies[num] = body.strip(b"\r\n")
+
+        pages = int(re.search(rb"/Pages (\d+) 0 R", bodies[root]).group(1))
+        kids = re.search(rb"/Kids \[(.*?)\]", bodies[pages], re.S).group(1)
+        skip = {root, pages} | ({info} if self._info is not None else set())
+
+        mapping = {pages: 2}
+        for num in bodies:
+            if num not in skip:
+                mapping[num] = len(self._offsets)
+                self._offsets.append(0)
+        if self._info is None:
+            self._info = mapping[info]
+
+        def renumber(data):
+            return _PDF_REF.sub(
+                lambda m: b"%d 0 R" % mapping[int(m.group(1))], data)
+
+        for num, body in bodies.items():
+            if num in skip:
+                continue
+            # Only the dictionary holds references, not the stream data
+            head, keyword, data = body.partition(b"stream")
+            self._object(mapping[num], renumber(head) + keyword + data)
+        self._kids.extend(mapping[int(k)] for k in _PDF_REF.findall(kids))
+
+    def close(self) -> int:
+        """
+        Write the catalog, page tree and xref table. Returns the page count.
+        """
+        self._object(1, b"<<\n/PageMode /UseNone /Pages 2 0 R /Type /Catalog\n>>")
+        kids = b" ".join(b"%d 0 R" % k for k in self._kids)
+        self._object(2, b"<<\n/Count %d /Kids [ %s ] /Type /Pages\n>>"
+                     % (len(self._kids), kids))
+        xref = self._pos
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % len(self._offsets))
+        self._write(b"".join(b"%010d 00000 n \n" % offset
+                             for offset in self._offsets[1:]))
+        self._write(b"trailer\n<<\n/Info %d 0 R\n/Root 1 0 R\n/Size %d\n>>\n"
+                    b"startxref\n%d\n%%%%EOF\n"
+                    % (self._info, len(self._offsets), xref))
+        return len(self._kids)
+
+
+def write_drugs_pdf(rows, fileobj, generated_on) -> int:
+    """
+    Lay out the drugs report for `rows` (see drug_export_rows) into
+    `fileobj`, EXPORT_PDF_ROWS_PER_PART rows per ReportLab document (see
+    the module docstring). Returns the page count.
+    """
+    styles = getSampleStyleSheet()
+    flowables = [Paragraph("Registered Drugs Report", styles["Title"]),
+                 Spacer(1, 12)]
+    joined = _PdfJoin(fileobj)
+    rows = iter(rows)
+    part = list(islice(rows, cfg.EXPORT_PDF_ROWS_PER_PART))
+    while True:
+        flowables += _pdf_tables(part, cfg.EXPORT_PDF_ROWS_PER_TABLE)
+        part = list(islice(rows, cfg.EXPORT_PDF_ROWS_PER_PART))
+        if not part:
+            flowables += [Spacer(1, 20),
+                          Paragraph(f"Generated on {generated_on} by Admin System",
+                                    styles["Normal"])]
+        buf = io.BytesIO()
+        SimpleDocTemplate(buf, pagesize=letter, pageCompression=1).build(flowables)
+        joined.add(buf.getvalue())
+        if not part:
+            return joined.close()
+        flowables = []
+
+
+# DOCX run markup, as python-docx's run.text setter writes it
+_XML_ESCAPE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff\ud800-\udfff]")
+_RUN_BREAKS = re.compile("([\t\r\n])")
+_DOCX_PLACEHOLDER = "MEDGUARD-CELL-{}"
+_DOCX_DOCUMENT = "word/document.xml"
+
+
+def _docx_run(text: str) -> str:
+    """
+    `<w:r>` for a cell holding `text`: tabs become <w:tab/>, line breaks
+    <w:br/>, and runs of other characters a <w:t> (space-preserving when
+    padded with whitespace).
+    """
+    if _XML_INVALID.search(text):
+        raise ValueError("All strings must be XML compatible: Unicode or "
+                         "ASCII, no NULL bytes or control characters")
+    parts = []
+    for piece in _RUN_BREAKS.split(text):
+        if not piece:
+            continue
+        if piece == "\t":
+            parts.append("<w:tab/>")
+        elif piece in "\r\n":
+            parts.append("<w:br/>")
+        else:
+            space = ' xml:space="preserve"' if len(piece.strip()) < len(piece) else ""
+            parts.append(f"<w:t{space}>{piece.translate(_XML_ESCAPE)}</w:t>")
+    return f"<w:r>{''.join(parts)}</w:r>" if parts else "<w:r/>"
+
+
+def _docx_skeleton(generated_on):
+    """
+    The drugs report with a header row and one placeholder row, saved.
+    """
+    doc = Document()
+    doc.add_heading("Registered Drugs Report", 0)
+
+    table = doc.add_table(rows=1, cols=len(DRUG_EXPORT_HEADER))
+    table.style = "Table Grid"
+    for cell, title in zip(table.rows[0].cells, DRUG_EXPORT_HEADER):
+        cell.text = title
+    for i, cell in enumerate(table.add_row().cells):
+        cell.text = _DOCX_PLACEHOLDER.format(i)
+
+    doc.add_paragraph()
+    doc.add_paragraph(f"Generated on {generated_on} by Admin System")
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf
+
+
+def _split_row_template(xml: str):
+    """
+    Cut document.xml around the placeholder row. Returns (text before
+    the row, the row's fragments between cells, text after the row).
+    """
+    runs = [_docx_run(_DOCX_PLACEHOLDER.format(i))
+            for i in range(len(DRUG_EXPORT_HEADER))]
+    first = xml.index(runs[0])
+    row_start = max(m.start() for m in re.finditer(r"<w:tr[ >]", xml[:first]))
+    row_end = xml.index("</w:tr>", first) + len("</w:tr>")
+
+    row, fragments = xml[row_start:row_end], []
+    for run in runs:
+        before, row = row.split(run, 1)
+        fragments.append(before)
+    fragments.append(row)
+    return xml[:row_start], fragments, xml[row_end:]
+
+
+def write_drugs_docx(rows, fileobj, generated_on) -> int:
+    """
+    Write the drugs report for `rows` (see drug_export_rows) as a .docx
+    into `fileobj`. Same document as filling a python-docx table cell by
+    cell, with None shown as "N/A". Returns the number of rows written.
+    """
+    with zipfile.ZipFile(_docx_skeleton(generated_on)) as src, \
+            zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            if info.filename != _DOCX_DOCUMENT:
+                dst.writestr(info, src.read(info.filename))
+                continue
+
+            head, fragments, tail = _split_row_template(
+                src.read(info.filename).decode("utf-8"))
+            written = 0
+            with dst.open(info, "w", force_zip64=True) as out:
+                out.write(head.encode("utf-8"))
+                rows = iter(rows)
+                while True:
+                    chunk = list(islice(rows, cfg.EXPORT_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    parts = []
+                    for row in chunk:
+                        for fragment, value in zip(fragments, row):
+                            parts.append(fragment)
+                            parts.append(_docx_run(
+                                str(value) if value is not None else "N/A"))
+                        parts.append(fragments[-1])
+                    out.write("".join(parts).encode("utf-8"))
+                    written += len(chunk)
+                out.write(tail.encode("utf-8"))
+    return written
+
+
+def dump_chunks(cursor):
+    """
+    Rows of an executed `cursor` as lists of at most EXPORT_CHUNK_SIZE
+    tuples.
+    """
+    for rows in fetch_chunks(cursor):
+        yield [tuple(row) for row in rows]
+
+
+def csv_blocks(columns, chunks):
+    """
+    CSV (header line, then one block per chunk), UTF-8 encoded.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def ndjson_blocks(columns, chunks):
+    """
+    One JSON object per row and line, one block per chunk, UTF-8 encoded.
+    """
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False,
+                       default=str, separators=(",", ":")) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+
+def gzip_blocks(blocks, level=None):
+    """
+    Compress `blocks` into a single gzip stream as they are produced.
+    """
+    level = cfg.EXPORT_GZIP_LEVEL if level is None else level
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def dump_blocks(fmt, columns, chunks, gzip=False):
+    """
+    The encoded stream for `fmt` ("csv" or "ndjson"), gzipped if asked.
+    """
+    blocks = (csv_blocks if fmt == "csv" else ndjson_blocks)(columns, chunks)
+    return gzip_blocks(blocks) if gzip else blocks
+
+
+def spooled_file():
+    return SpooledTemporaryFile(max_size=cfg.EXPORT_SPOOL_MAX)
+
+
+def stream_file(fileobj, block_size=None):
+    """
+    Yield `fileobj` from the start in blocks, closing it at the end (or
+    when the client goes away).
+    """
+    block_size = block_size or cfg.EXPORT_STREAM_BLOCK
+    try:
+        fileobj.seek(0)
+        while True:
+            block = fileobj.read(block_size)
+            if not block:
+                return
+            yield block
+    finally:
+        fileobj.close()
@@ -0,0 +1,506 @@
+"""
+Versioned schema migrations.
+
+Migrations are ordered functions registered with @migration(version, name).
+Applied versions are recorded in `schema_migrations`, so each one runs once
+per database. Backfills go through `backfill()`, which updates and commits
+in small chunks, so live verification and reporting never wait behind one
+long write lock.
+
+Usage:
+    python -m backend.migrations            # apply pending migrations
+    python -m backend.migrations status     # list applied / pending
+"""
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from backend.config import get_config
+from backend.database import connect, normalize_batch_key, FileLock
+
+# Load configuration
+cfg = get_config()
+
+MIGRATIONS = []  # (version, name, fn), kept sorted by version
+
+
+def migration(version: int, name: str):
+    """
+    Register `fn(conn)` as schema migration `version`.
+    """
+    def register(fn):
+        if any(v == version for v, _, _ in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+# ---------------------------
+# Helpers for migrations
+# ---------------------------
+
+def column_exists(conn, table_name, column_name):
+    columns = [row[1]
+               for row in conn.execute(f"PRAGMA table_info({table_name})")]
+    return column_name in columns
+
+
+def add_column(conn, table_name, column_name, definition):
+    """
+    ALTER TABLE ... ADD COLUMN unless the column is already there.
+    """
+    if not column_exists(conn, table_name, column_name):
+        conn.execute(
+            f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}")
+        conn.commit()
+
+
+def create_index(conn, name, table_name, columns, unique=False, where=None):
+    conn.execute(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+        f"ON {table_name}({columns})" + (f" WHERE {where}" if where else ""))
+    conn.commit()
+
+
+def backfill(conn, table_name, assignments, where, params=(),
+             chunk_size=None, pause=None):
+    """
+    Run `UPDATE table SET assignments WHERE where` in chunks of
+    `chunk_size` rows, committing after each chunk and pausing briefly so
+    other writers can take the lock. `where` must stop matching a row once
+    it has been updated. Returns the number of rows updated.
+    """
+    chunk_size = chunk_size or cfg.MIGRATION_BATCH_SIZE
+    pause = cfg.MIGRATION_BATCH_PAUSE if pause is None else pause
+    total = 0
+    while True:
+        cur = conn.execute(
+            f"""
+            UPDATE {table_name} SET {assignments}
+            WHERE rowid IN (
+                SELECT rowid FROM {table_name} WHERE {where} LIMIT ?
+            )
+            """,
+            (*params, chunk_size)
+        )
+        conn.commit()
+        if cur.rowcount <= 0:
+            return total
+        total += cur.rowcount
+        if pause:
+            time.sleep(pause)
+
+
+def create_fts(conn, table_name, columns, tokenize="trigram"):
+    """
+    Create `{table}_fts`, an external-content FTS5 index over `columns` of
+    `table`, with triggers that keep it in sync, and index existing rows.
+    Updates that touch none of `columns` (e.g. status flips) skip the
+    index entirely.
+    """
+    fts = f"{table_name}_fts"
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    conn.executescript(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{table_name}', content_rowid='id',
+            tokenize='{tokenize}'
+        );
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});
+        END;
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+        END;
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table_name} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});
+        END;
+        INSERT INTO {fts}({fts}) VALUES ('rebuild');
+    """)
+    conn.commit()
+
+
+def fts5_supported(conn, tokenize="trigram") -> bool:
+    try:
+        conn.execute(
+            f"CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x, tokenize='{tokenize}')")
+        conn.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+# ---------------------------
+# Migrations
+# ---------------------------
+
+@migration(1, "base schema")
+def _base_schema(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS drugs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            batch_number TEXT UNIQUE NOT NULL,
+            mfg_date TEXT NOT NULL,
+            expiry_date TEXT NOT NULL,
+            manufacturer TEXT NOT NULL,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            drug_name TEXT,
+            batch_number TEXT NOT NULL,
+            location TEXT,
+            note TEXT,
+            reported_on TIMESTAMP DEFAULT (datetime('now')),
+            status INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admin_users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            company_name TEXT,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            is_verified INTEGER DEFAULT 0,
+            role TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+    # Columns older databases were created without
+    # (formerly migrate_add_mfg_date.py / migrate_reports_table.py)
+    add_column(conn, "drugs", "mfg_date", "TEXT")
+    add_column(conn, "reports", "drug_name", "TEXT")
+    add_column(conn, "reports", "status", "INTEGER DEFAULT 0")
+    add_column(conn, "admin_users", "company_name", "TEXT")
+
+
+@migration(2, "normalized batch_key on drugs and reports")
+def _batch_keys(conn):
+    conn.create_function("normalize_batch_key", 1,
+                         normalize_batch_key, deterministic=True)
+    for table in ("drugs", "reports"):
+        add_column(conn, table, "batch_key", "TEXT")
+        backfill(conn, table, "batch_key = normalize_batch_key(batch_number)",
+                 "batch_key IS NULL")
+
+    try:
+        create_index(conn, "idx_drugs_batch_key", "drugs", "batch_key",
+                     unique=True)
+    except sqlite3.IntegrityError:
+        # Existing rows differ only by case/whitespace; keep them reachable
+        print("⚠️ Duplicate batch keys in 'drugs'; creating a non-unique index.")
+        create_index(conn, "idx_drugs_batch_key_dup", "drugs", "batch_key")
+    create_index(conn, "idx_reports_batch_key", "reports", "batch_key")
+
+
+@migration(3, "drugs.expiry_on and date indexes")
+def _date_columns(conn):
+    add_column(conn, "drugs", "expiry_on", "TEXT")
+    backfill(conn, "drugs", "expiry_on = date(expiry_date)",
+             "expiry_on IS NULL AND date(expiry_date) IS NOT NULL")
+    create_index(conn, "idx_drugs_expiry_on", "drugs", "expiry_on")
+    create_index(conn, "idx_drugs_created_at", "drugs", "created_at")
+
+
+@migration(4, "reports status/date indexes")
+def _report_indexes(conn):
+    # Unread badges filter on status (and today's date); every listing
+    # pages backwards through reported_on. Batch counts already use
+    # idx_reports_batch_key.
+    create_index(conn, "idx_reports_status_reported_on", "reports",
+                 "status, reported_on")
+    create_index(conn, "idx_reports_reported_on", "reports", "reported_on")
+
+
+@migration(5, "full-text search on reports and drugs")
+def _full_text_search(conn):
+    # Searches fall back to LIKE while these tables are missing
+    # (see backend.search)
+    if not fts5_supported(conn):
+        print("⚠️ SQLite lacks FTS5 trigram support; search will use LIKE.")
+        return
+    create_fts(conn, "reports", ("drug_name", "batch_number", "location", "note"))
+    create_fts(conn, "drugs", ("name", "batch_number"))
+
+
+@migration(6, "report counters")
+def _report_counters(conn):
+    # Badge counts kept current by triggers, in the same transaction as
+    # the write that changes them. Buckets: 'all' and each report day
+    # (YYYY-MM-DD, local time like reported_on; 'unknown' if unparsable).
+    conn.executescript("""
+        BEGIN;
+        CREATE TABLE IF NOT EXISTS report_counters (
+            bucket TEXT PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0,
+            unread INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS report_counters_ai AFTER INSERT ON reports BEGIN
+            INSERT INTO report_counters (bucket, total, unread)
+            VALUES ('all', 1, new.status = 0), (COALESCE(date(new.reported_on), 'unknown'), 1, new.status = 0)
+            ON CONFLICT (bucket) DO UPDATE SET
+                total = total + 1, unread = unread + excluded.unread;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS report_counters_ad AFTER DELETE ON reports BEGIN
+            UPDATE report_counters
+            SET total = total - 1, unread = unread - (old.status = 0)
+            WHERE bucket IN ('all', COALESCE(date(old.reported_on), 'unknown'));
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS report_counters_au
+        AFTER UPDATE OF status, reported_on ON reports BEGIN
+            UPDATE report_counters
+            SET total = total - 1, unread = unread - (old.status = 0)
+            WHERE bucket IN ('all', COALESCE(date(old.reported_on), 'unknown'));
+            INSERT INTO report_counters (bucket, total, unread)
+            VALUES ('all', 1, new.status = 0), (COALESCE(date(new.reported_on), 'unknown'), 1, new.status = 0)
+            ON CONFLICT (bucket) DO UPDATE SET
+                total = total + 1, unread = unread + excluded.unread;
+        END;
+
+        DELETE FROM report_counters;
+        INSERT INTO report_counters (bucket, total, unread)
+        SELECT 'all', COUNT(*), COALESCE(SUM(status = 0), 0) FROM reports;
+        INSERT INTO report_counters (bucket, total, unread)
+        SELECT COALESCE(date(reported_on), 'unknown'), COUNT(*), SUM(status = 0)
+        FROM reports GROUP BY 1;
+        COMMIT;
+    """)
+
+
+@migration(7, "per-regulator report watermarks")
+def _report_watermarks(conn):
+    # "Seen up to report id X" per regulator; viewing the reports page
+    # moves it forward instead of rewriting every report's status inline
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admin_report_watermarks (
+            admin_id INTEGER PRIMARY KEY REFERENCES admin_users(id),
+            last_seen_id INTEGER NOT NULL DEFAULT 0,
+            seen_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    conn.commit()
+
+
+# Rollup key of a reports row (`new` or `old`) at each grain
+ROLLUP_BATCH = "COALESCE({r}.batch_key, {r}.batch_number)"
+ROLLUP_LOCATION = "COALESCE(NULLIF(lower(trim({r}.location)), ''), 'unknown')"
+ROLLUP_BUCKETS = {
+    "h": "COALESCE(strftime('%Y-%m-%d %H:00', {r}.reported_on), 'unknown')",
+    "d": "COALESCE(date({r}.reported_on), 'unknown')",
+}
+
+
+def _rollup_rows(r):
+    return ", ".join(
+        f"('{grain}', {bucket}, {ROLLUP_BATCH}, {ROLLUP_LOCATION}, 1)"
+        .format(r=r)
+        for grain, bucket in ROLLUP_BUCKETS.items()
+    )
+
+
+def _rollup_match(r):
+    return " OR ".join(
+        f"(grain = '{grain}' AND bucket = {bucket} AND batch_key = "
+        f"{ROLLUP_BATCH} AND location = {ROLLUP_LOCATION})".format(r=r)
+        for grain, bucket in ROLLUP_BUCKETS.items()
+    )
+
+
+def _rollup_triggers(counted=None):
+    """
+    Triggers that keep report_rollups in step with reports; with
+    `counted` (SQL over `{r}`), only for rows where it holds.
+    """
+    def when(r):
+        return f"WHEN {counted.format(r=r)} " if counted else ""
+
+    upsert = """
+        INSERT INTO report_rollups (grain, bucket, batch_key, location, count)
+        VALUES {rows}
+        ON CONFLICT (grain, bucket, batch_key, location) DO UPDATE SET
+            count = count + 1;
+    """
+    decrement = "UPDATE report_rollups SET count = count - 1 WHERE {match};"
+    return f"""
+        DROP TRIGGER IF EXISTS report_rollups_ai;
+        DROP TRIGGER IF EXISTS report_rollups_ad;
+        DROP TRIGGER IF EXISTS report_rollups_au;
+
+        CREATE TRIGGER report_rollups_ai AFTER INSERT ON reports
+        {when("new")}BEGIN
+            {upsert.format(rows=_rollup_rows("new"))}
+        END;
+
+        CREATE TRIGGER report_rollups_ad AFTER DELETE ON reports
+        {when("old")}BEGIN
+            {decrement.format(match=_rollup_match("old"))}
+        END;
+
+        CREATE TRIGGER report_rollups_au
+        AFTER UPDATE OF batch_key, batch_number, location, reported_on ON reports
+        {when("old")}BEGIN
+            {decrement.format(match=_rollup_match("old"))}
+            {upsert.format(rows=_rollup_rows("new"))}
+        END;
+    """
+
+
+@migration(8, "report rollups")
+def _report_rollups(conn):
+    # Report counts per (hour or day, batch, location), kept current by
+    # triggers so hotspot queries read a few rollup rows per bucket
+    # instead of grouping the reports table.
+    #
+    # Existing rows are backfilled in id ranges, one short transaction
+    # each, while writes go on. report_rollups_backfill holds the highest
+    # id when the triggers were created and how far the backfill has got;
+    # until it finishes the triggers only count rows above either mark,
+    # so a row changed or deleted before its range is read is counted
+    # once, by the backfill.
+    conn.executescript(f"""
+        BEGIN IMMEDIATE;
+        CREATE TABLE IF NOT EXISTS report_rollups (
+            grain TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            batch_key TEXT NOT NULL,
+            location TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (grain, bucket, batch_key, location)
+        ) WITHOUT ROWID;
+        DELETE FROM report_rollups;
+
+        DROP TABLE IF EXISTS report_rollups_backfill;
+        CREATE TABLE report_rollups_backfill (high INTEGER NOT NULL, done INTEGER NOT NULL);
+        INSERT INTO report_rollups_backfill
+        SELECT COALESCE(MAX(id), 0), 0 FROM reports;
+        {_rollup_triggers(
+            "({r}.id > (SELECT high FROM report_rollups_backfill)"
+            " OR {r}.id <= (SELECT done FROM report_rollups_backfill))")}
+        COMMIT;
+    """)
+
+    high = conn.execute("SELECT high FROM report_rollups_backfill").fetchone()[0]
+    step = cfg.MIGRATION_BATCH_SIZE
+    for low in range(0, high, step):
+        top = min(low + step, high)
+        conn.execute("BEGIN IMMEDIATE")
+        for grain, bucket in ROLLUP_BUCKETS.items():
+            conn.execute(
+                f"""
+                INSERT INTO report_rollups (grain, bucket, batch_key, location, count)
+                SELECT ?, {bucket.format(r="reports")},
+                       {ROLLUP_BATCH.format(r="reports")},
+                       {ROLLUP_LOCATION.format(r="reports")}, COUNT(*)
+                FROM reports WHERE id > ? AND id <= ?
+                GROUP BY 2, 3, 4
+                ON CONFLICT (grain, bucket, batch_key, location) DO UPDATE SET
+                    count = count + excluded.count
+                """,
+                (grain, low, top)
+            )
+        conn.execute("UPDATE report_rollups_backfill SET done = ?", (top,))
+        conn.commit()
+        if cfg.MIGRATION_BATCH_PAUSE:
+            time.sleep(cfg.MIGRATION_BATCH_PAUSE)
+
+    # Every row is counted now: plain triggers, no progress lookups
+    conn.executescript(f"""
+        BEGIN IMMEDIATE;
+        {_rollup_triggers()}
+        DROP TABLE report_rollups_backfill;
+        COMMIT;
+    """)
+
+
+@migration(9, "reports.duplicate_count")
+def _duplicate_count(conn):
+    # Repeat submissions folded into a report (see backend.throttle)
+    add_column(conn, "reports", "duplicate_count", "INTEGER NOT NULL DEFAULT 0")
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+
+def _ensure_version_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    conn.commit()
+
+
+def applied_versions(conn) -> set:
+    _ensure_version_table(conn)
+    return {row[0]
+            for row in conn.execute("SELECT version FROM schema_migrations")}
+
+
+def pending(conn) -> list:
+    done = applied_versions(conn)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def migrate(db_path=None) -> list:
+    """
+    Apply pending migrations in order and return their versions.
+    Cheap when the schema is current (one query). Concurrent callers
+    (e.g. several gunicorn workers booting) are serialized by a lock file,
+    and each re-checks what is pending once it holds the lock.
+    """
+    db_path = Path(db_path or cfg.DB_PATH)
+    conn = connect(db_path)
+    try:
+        if not pending(conn):
+            return []
+        with FileLock(Path(f"{db_path}.migrate.lock")):
+            applied = []
+            for version, name, fn in pending(conn):
+                print(f"🔄 Applying migration {version}: {name}")
+                fn(conn)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+                    (version, name))
+                conn.commit()
+                applied.append(version)
+            return applied
+    finally:
+        conn.close()
+
+
+def status(db_path=None):
+    conn = connect(db_path or cfg.DB_PATH)
+    try:
+        _ensure_version_table(conn)
+        done = dict(conn.execute(
+            "SELECT version, applied_at FROM schema_migrations").fetchall())
+    finally:
+        conn.close()
+    for version, name, _ in MIGRATIONS:
+        mark = f"applied {done[version]}" if version in done else "pending"
+        print(f"{version:>4}  {name:<45} {mark}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        status()
+    else:
+        print(f"Migrating database at: {cfg.DB_PATH}")
+        versions = migrate()
+        print(f"✅ Applied {len(versions)} migration(s)." if versions
+              else "✅ Schema is up to date.")
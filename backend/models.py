@@ -1,83 +1,505 @@
-import sqlite3
-import time
+import threading
+from datetime import date, datetime, timedelta
 from typing import Optional, Dict
-from backend.database import get_db
+from concurrent.futures import TimeoutError as FutureTimeout
+from backend.config import get_config
+from backend.database import get_db, normalize_batch_key
+from backend.cache import batch_cache, verify_page_cache, MISS
+from backend.registry import registry, MISS as REGISTRY_MISS
+from backend.bloom import batch_bloom
+from backend.writer import writer, QueueFull
+from backend.search import text_search
+from backend.pagination import keyset_page
+from backend.events import reports_changed
+
+# Load configuration
+cfg = get_config()
+
 
 # ---------------------------
-# Retry Settings
+# DRUG BATCH FUNCTIONS
 # ---------------------------
-MAX_RETRIES = 3
-RETRY_DELAY = 0.3  # seconds
+
+def _insert_drug_row(conn, row):
+    conn.execute(
+        """
+        INSERT INTO drugs (name, batch_number, batch_key, mfg_date, expiry_date, expiry_on, manufacturer)
+        VALUES (?, ?, ?, ?, ?, date(?), ?)
+        """,
+        row
+    )
 
 
-def _execute_with_retry(conn, query, params=()):
+def insert_drug(name: str, batch_number: str, mfg_date: str, expiry_date: str, manufacturer: str):
     """
-    Execute a query with retry logic if the database is locked.
+    Insert a new drug batch through the writer thread and wait for it.
+    Raises IntegrityError if the batch (by normalized key) already exists.
     """
-    for attempt in range(MAX_RETRIES):
-        try:
-            c = conn.cursor()
-            c.execute(query, params)
-            return c
-        except sqlite3.OperationalError as e:
-            if "locked" in str(e).lower() and attempt < MAX_RETRIES - 1:
-                time.sleep(RETRY_DELAY)
-                continue
-            raise
+    key = normalize_batch_key(batch_number)
+    writer.call(_insert_drug_row,
+                (name, batch_number, key, mfg_date, expiry_date, expiry_date,
+                 manufacturer))
 
+    # Drop any cached (possibly negative) lookup for this batch and tell
+    # the other workers their registry snapshot is out of date
+    batch_cache.invalidate(key)
+    verify_page_cache.invalidate(key)
+    generation = registry.notify_write() if registry is not None else None
+    if batch_bloom is not None:
+        batch_bloom.add(key, generation)
 
-# ---------------------------
-# DRUG BATCH FUNCTIONS
-# ---------------------------
 
-def insert_drug(name: str, batch_number: str, mfg_date: str, expiry_date: str, manufacturer: str):
+def registry_generation() -> Optional[int]:
     """
-    Insert a new drug batch into the database with retry logic.
+    Current shared registry generation (None without a shared registry).
+    Changes whenever any worker registers a batch.
     """
-    conn = get_db()
-    _execute_with_retry(conn,
-                        """
-        INSERT INTO drugs (name, batch_number, mfg_date, expiry_date, manufacturer)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-                        (name, batch_number, mfg_date, expiry_date, manufacturer)
-                        )
-    conn.commit()
+    return registry.counter.value() if registry is not None else None
 
 
 def get_drug_by_batch(batch_number: str) -> Optional[Dict]:
     """
     Retrieve a drug batch by its batch number.
     Returns a dict with all fields if found, else None.
+    Batches the Bloom filter rules out are rejected immediately; the rest
+    are served from the shared registry index when its snapshot is current,
+    then from the in-process batch cache, then from SQLite.
     """
+    key = normalize_batch_key(batch_number)
+    if batch_bloom is not None and batch_bloom.definitely_absent(key):
+        return None
+
+    generation = None
+    if registry is not None:
+        drug = registry.lookup(key)
+        if drug is not REGISTRY_MISS:
+            return drug
+        generation = registry_generation()
+
+    cached = batch_cache.get(key, generation)
+    if cached is not MISS:
+        return dict(cached) if cached else None
+
     conn = get_db()
     c = conn.cursor()
     c.execute(
         """
-        SELECT name, batch_number, mfg_date, expiry_date, manufacturer
+        SELECT name, batch_number, mfg_date, expiry_date, expiry_on, manufacturer
         FROM drugs
-        WHERE batch_number = ?
+        WHERE batch_key = ?
         """,
-        (batch_number,)
+        (key,)
     )
     row = c.fetchone()
-    return dict(row) if row else None
+    drug = dict(row) if row else None
+    batch_cache.put(key, drug, generation)
+    return dict(drug) if drug else None
+
+
+def get_drugs_by_batches(batch_numbers) -> Dict[str, Dict]:
+    """
+    Resolve many batch numbers with a single IN (...) query.
+    Returns {batch_key: drug dict} for the ones that exist; batches the
+    Bloom filter rules out are left out of the query entirely.
+    """
+    keys = {normalize_batch_key(b) for b in batch_numbers}
+    if batch_bloom is not None:
+        keys = {k for k in keys if not batch_bloom.definitely_absent(k)}
+    if not keys:
+        return {}
+
+    conn = get_db()
+    placeholders = ", ".join("?" * len(keys))
+    rows = conn.execute(
+        f"""
+        SELECT batch_key, name, batch_number, mfg_date, expiry_date, expiry_on, manufacturer
+        FROM drugs
+        WHERE batch_key IN ({placeholders})
+        """,
+        tuple(keys)
+    ).fetchall()
+    found = {}
+    for row in rows:
+        drug = dict(row)
+        found[drug.pop("batch_key")] = drug
+    return found
 
 
 # ---------------------------
 # REPORT FUNCTIONS
 # ---------------------------
 
-def insert_report(batch_number: str, location: str = "", note: str = ""):
+def _insert_report_row(conn, row):
+    return conn.execute(
+        """
+        INSERT INTO reports (drug_name, batch_number, batch_key, location, note, reported_on, status)
+        VALUES (?, ?, ?, ?, ?, ?, 0)
+        """,
+        row
+    ).lastrowid
+
+
+def submit_report(batch_number: str, location: str = "", note: str = "",
+                  drug_name: Optional[str] = None):
+    """
+    Queue a new report for a given batch number on the writer thread and
+    return its Future (resolving to the new report id).
+    The report is timestamped now (local time) and starts as New (status 0).
+    Raises QueueFull when the write queue is full.
+    """
+    future = writer.submit(
+        _insert_report_row,
+        (drug_name, batch_number, normalize_batch_key(batch_number),
+         location, note, datetime.now())
+    )
+    future.add_done_callback(reports_changed)
+    return future
+
+
+def await_report(future) -> bool:
+    """
+    True once a submitted report has committed ("durable" intake mode),
+    False if it is only queued ("fast" mode, or the commit outlived
+    REPORT_ACK_TIMEOUT). In durable mode, re-raises the exception of a
+    writer job that failed.
+    """
+    if cfg.REPORT_INTAKE_MODE != "durable":
+        return False
+    try:
+        future.result(timeout=cfg.REPORT_ACK_TIMEOUT)
+    except FutureTimeout:
+        return False
+    return True
+
+
+# Folds per report id not yet written; one writer job applies them all
+_pending_folds = {}
+_folds_lock = threading.Lock()
+
+
+def _apply_folds(conn, report_id, taken):
+    with _folds_lock:
+        count = _pending_folds.pop(report_id, 0)
+    taken.append(count)
+    conn.execute(
+        "UPDATE reports SET duplicate_count = duplicate_count + ? WHERE id = ?",
+        (count, report_id)
+    )
+
+
+def _submit_folds(report_id):
+    taken = []
+    try:
+        future = writer.submit(_apply_folds, report_id, taken)
+    except QueueFull:
+        with _folds_lock:
+            _pending_folds.pop(report_id, None)  # shed, like the report would be
+        return
+    future.add_done_callback(lambda f: _folds_done(f, report_id, taken))
+
+
+def _folds_done(future, report_id, taken):
+    if not future.cancelled() and future.exception() is None:
+        return
+    # The group rolled back: put the counts taken back and try again later
+    with _folds_lock:
+        if taken and taken[0]:
+            _pending_folds[report_id] = (_pending_folds.get(report_id, 0)
+                                         + taken[0])
+    threading.Timer(cfg.REPORT_RETRY_AFTER, _submit_folds, (report_id,)).start()
+
+
+def _queue_fold(report_id):
+    with _folds_lock:
+        queued = report_id in _pending_folds
+        _pending_folds[report_id] = _pending_folds.get(report_id, 0) + 1
+    if not queued:
+        _submit_folds(report_id)
+
+
+def fold_duplicate(original) -> None:
+    """
+    Count a repeat submission against the report `original` (its writer
+    Future) once that report has committed. Repeats of the same report
+    that arrive before the count is written share one update.
+    """
+    if original is None:
+        return
+
+    def fold(future):
+        if not future.cancelled() and future.exception() is None:
+            _queue_fold(future.result())
+
+    original.add_done_callback(fold)
+
+
+def _set_report_status(conn, report_id, status):
+    return conn.execute("UPDATE reports SET status = ? WHERE id = ?",
+                        (status, report_id)).rowcount
+
+
+def mark_checked(report_id: int) -> bool:
+    """
+    Mark one report as Checked. Returns False if it does not exist.
+    """
+    changed = writer.call(_set_report_status, report_id, 1) > 0
+    if changed:
+        reports_changed()
+    return changed
+
+
+def _record_watermark(conn, admin_id, last_seen_id):
+    conn.execute(
+        """
+        INSERT INTO admin_report_watermarks (admin_id, last_seen_id, seen_at)
+        VALUES (?, ?, datetime('now'))
+        ON CONFLICT (admin_id) DO UPDATE SET
+            last_seen_id = MAX(last_seen_id, excluded.last_seen_id),
+            seen_at = excluded.seen_at
+        """,
+        (admin_id, last_seen_id)
+    )
+
+
+def _check_reports_up_to(conn, last_id, limit):
+    return conn.execute(
+        """
+        UPDATE reports SET status = 1
+        WHERE id IN (
+            SELECT id FROM reports WHERE status = 0 AND id <= ? LIMIT ?
+        )
+        """,
+        (last_id, limit)
+    ).rowcount
+
+
+# Highest report id queued for checking by acknowledge_reports()
+_ack = {"target": 0, "running": False}
+_ack_lock = threading.Lock()
+
+
+def _ack_next_batch():
     """
-    Insert a new report for a given batch number with retry logic.
+    Queue the next batch of status flips up to the current target.
+    """
+    with _ack_lock:
+        target = _ack["target"]
+    try:
+        future = writer.submit(_check_reports_up_to, target,
+                               cfg.ACK_BATCH_SIZE)
+    except QueueFull:
+        # Intake surge: back off and let reports through first
+        threading.Timer(cfg.REPORT_RETRY_AFTER, _ack_next_batch).start()
+        return
+    future.add_done_callback(lambda f: _ack_batch_done(f, target))
+
+
+def _ack_batch_done(future, target):
+    """
+    Go on while the batch was full or the target has risen since it was
+    submitted (a page view while it ran); stop when caught up.
+    """
+    error = None if future.cancelled() else future.exception()
+    if future.cancelled() or error is not None:
+        # Stop rather than retry a failing job in a loop; the next
+        # acknowledge_reports() picks up from the same target
+        if error is not None:
+            print("Error acknowledging reports:", error)
+        with _ack_lock:
+            _ack["running"] = False
+        return
+    changed = future.result()
+    if changed:
+        reports_changed()
+    with _ack_lock:
+        if changed < cfg.ACK_BATCH_SIZE and _ack["target"] <= target:
+            _ack["running"] = False
+            return
+    _ack_next_batch()
+
+
+def acknowledge_reports(admin_id: int) -> int:
+    """
+    Record that `admin_id` has seen every report so far (their watermark)
+    and return that report id. Recording is one upsert; flipping the
+    seen New reports to Checked runs in the background on the writer,
+    ACK_BATCH_SIZE rows per job, so report intake keeps flowing between
+    batches.
+    """
+    last_id = get_db().execute(SQL_LAST_REPORT_ID).fetchone()[0]
+    try:
+        writer.submit(_record_watermark, admin_id, last_id)
+    except QueueFull:
+        return last_id  # the page view still succeeds
+
+    with _ack_lock:
+        _ack["target"] = max(_ack["target"], last_id)
+        if _ack["running"]:
+            return last_id
+        _ack["running"] = True
+    _ack_next_batch()
+    return last_id
+
+
+def report_watermark(admin_id: int) -> int:
+    """
+    Highest report id `admin_id` had seen when they last opened the
+    reports page (0 if never).
+    """
+    row = get_db().execute(
+        "SELECT last_seen_id FROM admin_report_watermarks WHERE admin_id = ?",
+        (admin_id,)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def count_unseen_reports(admin_id: int) -> int:
+    """
+    New reports that arrived after `admin_id`'s watermark: a primary-key
+    range, bounded by what came in since their last visit (the plan is
+    checked by backend.query_plans).
+    """
+    return get_db().execute(
+        SQL_UNSEEN_REPORTS, (report_watermark(admin_id),)
+    ).fetchone()[0]
+
+
+# Hot report queries. Each one must be answerable from an index:
+# backend.query_plans runs EXPLAIN QUERY PLAN over them and fails on a
+# full scan or a temp sort, so keep predicates sargable (compare the bare
+# reported_on column against a range, never date(reported_on)) and order
+# by the qualified column -- the formatted `reported_on` alias would force
+# a sort.
+REPORT_FIELDS = """id, drug_name, batch_number, location, note,
+       strftime('%Y-%m-%d %H:%M:%S', reported_on) AS reported_on, status,
+       duplicate_count"""
+
+REPORTS_NEWEST = "reports.reported_on DESC, reports.id DESC"
+REPORTS_NEWEST_FIRST = f"ORDER BY {REPORTS_NEWEST}"
+
+# Half-open day range: reported_on falls on a day from ?1 through ?2
+REPORTED_BETWEEN = "reports.reported_on >= date(?) AND reports.reported_on < date(?, '+1 day')"
+
+SQL_REPORTS = f"SELECT {REPORT_FIELDS} FROM reports {REPORTS_NEWEST_FIRST}"
+
+SQL_RECENT_REPORTS = f"{SQL_REPORTS} LIMIT ?"
+
+SQL_REPORTS_BETWEEN = f"""
+    SELECT {REPORT_FIELDS} FROM reports
+    WHERE {REPORTED_BETWEEN}
+    {REPORTS_NEWEST_FIRST}
+"""
+
+SQL_RECENT_REPORTS_BETWEEN = f"{SQL_REPORTS_BETWEEN} LIMIT ?"
+
+# Badge counts: one row of report_counters ('all' or a YYYY-MM-DD day),
+# maintained by triggers on reports (migration 6)
+SQL_REPORT_COUNTS = "SELECT total, unread FROM report_counters WHERE bucket = ?"
+
+SQL_COUNT_FOR_BATCH = "SELECT COUNT(*) FROM reports WHERE batch_key = ?"
+
+# Reports after a known id, oldest first (live dashboard updates)
+SQL_REPORTS_SINCE = f"SELECT {REPORT_FIELDS} FROM reports WHERE id > ? ORDER BY id LIMIT ?"
+
+SQL_LAST_REPORT_ID = "SELECT COALESCE(MAX(id), 0) FROM reports"
+
+# Unread reports after a watermark. The unary + keeps SQLite off the
+# status index, which would visit every unread report, so the plan is a
+# rowid range from the watermark.
+SQL_UNSEEN_REPORTS = "SELECT COUNT(*) FROM reports WHERE id > ? AND +status = 0"
+
+# Keyset order of report pages, newest first (see backend.pagination)
+REPORT_KEYS = ("reports.reported_on", "reports.id")
+
+REPORT_SEARCH_COLUMNS = ("drug_name", "batch_number", "location", "note")
+
+
+def _today() -> str:
+    # Reports are stamped in local time (see submit_report)
+    return date.today().isoformat()
+
+
+def list_reports(start: Optional[str] = None, end: Optional[str] = None,
+                 limit: Optional[int] = None):
+    """
+    Reports newest first, optionally restricted to the days from `start`
+    through `end` (YYYY-MM-DD) and capped at `limit` rows.
+    """
+    conn = get_db()
+    if start and end:
+        if limit:
+            return conn.execute(SQL_RECENT_REPORTS_BETWEEN,
+                                (start, end, limit)).fetchall()
+        return conn.execute(SQL_REPORTS_BETWEEN, (start, end)).fetchall()
+    if limit:
+        return conn.execute(SQL_RECENT_REPORTS, (limit,)).fetchall()
+    return conn.execute(SQL_REPORTS).fetchall()
+
+
+def list_reports_today(limit: Optional[int] = None):
+    today = _today()
+    return list_reports(today, today, limit)
+
+
+def report_filters(conn, search: str = "", start: str = "", end: str = ""):
+    """
+    The FROM/WHERE clause shared by report listings and exports, its
+    params, and its sort keys (best search match first, then newest).
+    """
+    join, where, params, rank = "", "", [], None
+    if search:
+        join, where, params, rank = text_search(
+            conn, "reports", search, REPORT_SEARCH_COLUMNS)
+
+    from_where = f"FROM reports {join} WHERE 1=1"
+    if where:
+        from_where += f" AND {where}"
+    if start and end:
+        from_where += f" AND {REPORTED_BETWEEN}"
+        params.extend([start, end])
+
+    # bm25 ranks are negative, best first; negate so every key sorts DESC
+    keys = ((f"-{rank}",) if rank else ()) + REPORT_KEYS
+    return from_where, params, keys
+
+
+def report_page(search: str = "", start: str = "", end: str = "",
+                cursor: Optional[str] = None, limit: Optional[int] = None,
+                with_total: bool = False, fields: str = REPORT_FIELDS):
+    """
+    One keyset page of reports, newest first (best match first when
+    searching), optionally restricted to the days from `start` through
+    `end`. Returns (rows, next_cursor, total); total is None unless
+    `with_total`. Raises InvalidCursor for a bad cursor.
     """
     conn = get_db()
-    _execute_with_retry(conn,
-                        "INSERT INTO reports (batch_number, location, note) VALUES (?, ?, ?)",
-                        (batch_number, location, note)
-                        )
-    conn.commit()
+    from_where, params, keys = report_filters(conn, search, start, end)
+
+    # Unfiltered and single-day totals come straight from report_counters
+    counted = with_total and not search and (not (start and end) or start == end)
+
+    rows, next_cursor, total = keyset_page(
+        conn, fields, from_where, params, keys, cursor=cursor, limit=limit,
+        with_total=with_total and not counted)
+    if counted:
+        total = report_counts(start or None)["total"]
+    return rows, next_cursor, total
+
+
+def report_counts(day: Optional[str] = None) -> Dict[str, int]:
+    """
+    {"total", "unread"} reports overall, or on `day` (YYYY-MM-DD).
+    A single primary-key read of report_counters.
+    """
+    row = get_db().execute(SQL_REPORT_COUNTS, (day or "all",)).fetchone()
+    return {"total": row[0], "unread": row[1]} if row else {"total": 0, "unread": 0}
+
+
+def count_unread_reports(today_only: bool = False) -> int:
+    """
+    Number of New (status 0) reports, optionally only today's.
+    """
+    return report_counts(_today() if today_only else None)["unread"]
 
 
 def count_reports_for_batch(batch_number: str) -> int:
@@ -85,13 +507,70 @@ def count_reports_for_batch(batch_number: str) -> int:
     Count how many reports exist for a given batch number.
     """
     conn = get_db()
-    c = conn.cursor()
-    c.execute(
-        "SELECT COUNT(*) as cnt FROM reports WHERE batch_number = ?",
-        (batch_number,)
+    return conn.execute(SQL_COUNT_FOR_BATCH,
+                        (normalize_batch_key(batch_number),)).fetchone()[0]
+
+
+# Rollup bucket labels (see migrations._report_rollups), local time
+ROLLUP_GRAINS = {
+    "h": (timedelta(hours=1), "%Y-%m-%d %H:00"),
+    "d": (timedelta(days=1), "%Y-%m-%d"),
+}
+
+# Top (batch, location) pairs in a window, with their average count over
+# the windows before it. Reads only the rollup rows in range (primary key).
+SQL_HOTSPOTS = """
+    SELECT batch_key, location, current, prior,
+           ROUND(current * 1.0 / MAX(prior * 1.0 / ?, 1.0), 2) AS spike
+    FROM (
+        SELECT batch_key, location,
+               SUM(CASE WHEN bucket >= ? THEN count ELSE 0 END) AS current,
+               SUM(CASE WHEN bucket < ? THEN count ELSE 0 END) AS prior
+        FROM report_rollups
+        WHERE grain = ? AND bucket BETWEEN ? AND ?
+        GROUP BY batch_key, location
     )
-    cnt = c.fetchone()["cnt"]
-    return cnt
+    WHERE current > 0
+"""
+
+
+def hotspots(grain: str = "h", span: int = 24, k: int = 10,
+             baseline: Optional[int] = None, order: str = "spike"):
+    """
+    The top `k` (batch, location) pairs by reports in the last `span`
+    hours ("h") or days ("d"), including the current one.
+
+    Each pair also gets `prior`, its reports in the `baseline` windows of
+    the same length before that, and `spike`, the window's count over
+    the baseline average (floored at 1 so a first burst still ranks).
+    `spiking` marks pairs at or above HOTSPOT_SPIKE_RATIO with at least
+    HOTSPOT_MIN_REPORTS reports. Order by "spike" or "count".
+    """
+    step, label = ROLLUP_GRAINS[grain]
+    baseline = baseline or cfg.HOTSPOT_BASELINE_WINDOWS
+    now = datetime.now()
+    if grain == "h":
+        now = now.replace(minute=0, second=0, microsecond=0)
+    else:
+        now = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    window_start = now - step * (span - 1)
+    baseline_start = window_start - step * span * baseline
+
+    ranking = ("spike DESC, current DESC" if order == "spike"
+               else "current DESC, spike DESC")
+    rows = get_db().execute(
+        f"{SQL_HOTSPOTS} ORDER BY {ranking}, batch_key, location LIMIT ?",
+        (baseline, window_start.strftime(label), window_start.strftime(label),
+         grain, baseline_start.strftime(label), now.strftime(label), k)
+    ).fetchall()
+
+    results = []
+    for row in rows:
+        item = dict(row)
+        item["spiking"] = (item["current"] >= cfg.HOTSPOT_MIN_REPORTS
+                           and item["spike"] >= cfg.HOTSPOT_SPIKE_RATIO)
+        results.append(item)
+    return results
 
 
 # ---------------------------
@@ -0,0 +1,109 @@
+"""
+Keyset (cursor) pagination.
+
+A page is "the next N rows after this sort key" instead of "N rows after
+skipping OFFSET", so every page is an index seek and costs the same no
+matter how deep it is. Listings order newest first on (timestamp, id),
+with the search rank in front when there is one. All keys sort DESC, so
+"after" is the row-value comparison (k1, k2, ...) < (?, ?, ...), which
+SQLite turns into a range on the matching index.
+
+Cursors are opaque to clients: the last row's sort key as URL-safe
+base64 JSON.
+"""
+
+import base64
+import binascii
+import json
+from backend.config import get_config
+
+# Load configuration
+cfg = get_config()
+
+
+class InvalidCursor(ValueError):
+    """
+    The cursor was not produced by encode_cursor().
+    """
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, width: int) -> list:
+    """
+    Decode a cursor holding `width` sort-key values.
+    Raises InvalidCursor if it is malformed or has the wrong shape.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise InvalidCursor(cursor) from None
+    if (not isinstance(values, list) or len(values) != width
+            or not all(isinstance(v, (str, int, float)) for v in values)):
+        raise InvalidCursor(cursor)
+    return values
+
+
+def page_size(requested) -> int:
+    """
+    Clamp a client-supplied ?limit= to 1..PAGE_SIZE_MAX.
+    """
+    try:
+        size = int(requested)
+    except (TypeError, ValueError):
+        return cfg.PAGE_SIZE_DEFAULT
+    return max(1, min(size, cfg.PAGE_SIZE_MAX))
+
+
+def order_by(keys) -> str:
+    """
+    ORDER BY clause for `keys` (all DESC), the order keyset_page() uses.
+    """
+    return "ORDER BY " + ", ".join(f"{key} DESC" for key in keys)
+
+
+def keyset_page(conn, select, from_where, params, keys, cursor=None,
+                limit=None, with_total=False):
+    """
+    Fetch one page of `SELECT {select} {from_where}` ordered by `keys`
+    (SQL expressions, all DESC), starting after `cursor`.
+
+    `from_where` is a FROM ... WHERE ... clause (use "WHERE 1=1" when there
+    is no filter). Returns (rows as dicts, next cursor or None, total or
+    None). The total counts every row matching the filters and costs a
+    separate COUNT(*), so it is only computed when asked for.
+    """
+    limit = limit or cfg.PAGE_SIZE_DEFAULT
+    names = [f"_k{i}" for i in range(len(keys))]
+    # Unary + keeps each key's stored value but drops its declared type,
+    # so PARSE_DECLTYPES hands back e.g. TIMESTAMP text, not a datetime
+    sort = ", ".join(f"+{key} AS {name}" for key, name in zip(keys, names))
+
+    query = f"SELECT {select}, {sort} {from_where}"
+    page_params = list(params)
+    if cursor:
+        after = decode_cursor(cursor, len(keys))
+        query += (f" AND ({', '.join(keys)}) < "
+                  f"({', '.join('?' * len(keys))})")
+        page_params += after
+    query += f" {order_by(keys)} LIMIT ?"
+    page_params.append(limit + 1)
+
+    rows = [dict(r) for r in conn.execute(query, page_params).fetchall()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][n] for n in names)
+    for row in rows:
+        for name in names:
+            del row[name]
+
+    total = None
+    if with_total:
+        total = conn.execute(f"SELECT COUNT(*) {from_where}",
+                             params).fetchone()[0]
+    return rows, next_cursor, total
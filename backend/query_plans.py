@@ -0,0 +1,92 @@
+"""
+Query-plan checks for the hot report queries.
+
+The admin UI polls the badge counts and report listings constantly, so
+each of these must be answered from an index. The check runs EXPLAIN QUERY
+PLAN against the current schema and reports any query that no longer uses
+its expected index or needs a temporary B-tree to sort.
+
+Usage:
+    python -m backend.query_plans            # exit status 1 on a regression
+    python -m backend.query_plans path/to.db
+"""
+
+import sys
+from backend.config import get_config
+from backend.database import connect
+from backend.models import (
+    SQL_REPORTS, SQL_RECENT_REPORTS, SQL_REPORTS_BETWEEN,
+    SQL_RECENT_REPORTS_BETWEEN, SQL_REPORT_COUNTS, SQL_COUNT_FOR_BATCH,
+    SQL_UNSEEN_REPORTS, REPORT_FIELDS, REPORT_KEYS, REPORTS_NEWEST_FIRST,
+)
+
+# Load configuration
+cfg = get_config()
+
+DAY = "2024-01-01"
+
+# A report page after a cursor, as backend.pagination.keyset_page builds it
+SQL_REPORTS_AFTER = (
+    f"SELECT {REPORT_FIELDS} FROM reports WHERE 1=1"
+    f" AND ({', '.join(REPORT_KEYS)}) < (?, ?) {REPORTS_NEWEST_FIRST} LIMIT ?"
+)
+
+# (name, sql, params, index the plan must use)
+HOT_QUERIES = [
+    ("all reports", SQL_REPORTS, (), "idx_reports_reported_on"),
+    ("latest reports", SQL_RECENT_REPORTS, (5,), "idx_reports_reported_on"),
+    ("report page after cursor", SQL_REPORTS_AFTER, (DAY, 1000, 50),
+     "idx_reports_reported_on"),
+    ("reports by day range", SQL_REPORTS_BETWEEN, (DAY, DAY),
+     "idx_reports_reported_on"),
+    ("latest reports today", SQL_RECENT_REPORTS_BETWEEN, (DAY, DAY, 5),
+     "idx_reports_reported_on"),
+    ("badge counts", SQL_REPORT_COUNTS, ("all",), "PRIMARY KEY"),
+    ("reports for batch", SQL_COUNT_FOR_BATCH, ("AB12",),
+     "idx_reports_batch_key"),
+    ("unseen since watermark", SQL_UNSEEN_REPORTS, (1000,),
+     "INTEGER PRIMARY KEY (rowid>?)"),
+]
+
+
+def explain(conn, sql, params=()) -> list:
+    """
+    The detail lines of EXPLAIN QUERY PLAN for `sql`.
+    """
+    return [row[-1] for row in
+            conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def check_query_plans(conn) -> list:
+    """
+    Return (name, plan lines, problem) for every hot query whose plan
+    regressed; an empty list means all of them use their indexes.
+    """
+    failures = []
+    for name, sql, params, index in HOT_QUERIES:
+        plan = explain(conn, sql, params)
+        text = "\n".join(plan)
+        if index not in text:
+            failures.append((name, plan, f"does not use {index}"))
+        elif "TEMP B-TREE" in text:
+            failures.append((name, plan, "sorts in a temporary B-tree"))
+    return failures
+
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else cfg.DB_PATH
+    conn = connect(db_path)
+    try:
+        for name, sql, params, _index in HOT_QUERIES:
+            print(f"{name}:")
+            for line in explain(conn, sql, params):
+                print(f"    {line}")
+        failures = check_query_plans(conn)
+    finally:
+        conn.close()
+
+    for name, _plan, problem in failures:
+        print(f"❌ {name}: {problem}")
+    if failures:
+        sys.exit(1)
+    print("✅ All hot report queries use their indexes.")
@@ -0,0 +1,261 @@
+"""
+Shared, read-only registry index of drug batches.
+
+The `drugs` table is snapshotted into a single file laid out as an
+open-addressing hash table (batch key -> drug row). Every gunicorn worker
+mmaps the same file, so the data lives once in the OS page cache and a
+lookup is a lock-free probe of shared memory.
+
+Writes bump a generation counter (itself a tiny mmap'd file shared by all
+workers). A snapshot older than the counter still answers hits, but its
+misses are not trusted until a background rebuild catches up.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from backend.config import get_config
+from backend.database import connect, FileLock, fcntl
+
+# Load configuration
+cfg = get_config()
+
+MAGIC = b"MGREG003"
+HEADER = struct.Struct("<8sQQQQ")  # magic, generation, slots, count, max_id
+SLOT = struct.Struct("<QQ")        # key hash, record offset (0 = empty)
+RECORD_LEN = struct.Struct("<I")
+
+# Sentinel: the index cannot answer authoritatively, ask the database
+MISS = object()
+
+
+def _hash_key(key: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class SharedCounter:
+    """
+    Monotonic 64-bit counter stored in a small mmap'd file.
+    Reads are plain memory loads; increments take a file lock.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = FileLock(Path(str(path) + ".lock"))
+        self._mm = None
+
+    def _map(self):
+        if self._mm is None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < 8:
+                    os.ftruncate(fd, 8)
+                self._mm = mmap.mmap(fd, 8)
+            finally:
+                os.close(fd)
+        return self._mm
+
+    def value(self) -> int:
+        return struct.unpack_from("<Q", self._map(), 0)[0]
+
+    def increment(self) -> int:
+        mm = self._map()
+        with self._lock:
+            value = struct.unpack_from("<Q", mm, 0)[0] + 1
+            struct.pack_into("<Q", mm, 0, value)
+            mm.flush()
+        return value
+
+
+class RegistryIndex:
+    """
+    Per-process view over the shared registry file.
+    """
+
+    FIELDS = ("name", "batch_number", "mfg_date", "expiry_date", "expiry_on",
+              "manufacturer")
+
+    def __init__(self, path: Path, db_path: Path):
+        self.path = Path(path)
+        self.db_path = Path(db_path)
+        self.counter = SharedCounter(Path(str(path) + ".gen"))
+        self._build_lock = FileLock(Path(str(path) + ".lock"))
+        self._view = None  # (mmap, inode, generation, slots)
+        self._rebuilding = threading.Lock()
+        self.lookups = 0
+        self.stale_lookups = 0
+        self.rebuilds = 0
+
+    # ---------------------------
+    # Building
+    # ---------------------------
+
+    def build(self, force: bool = False) -> bool:
+        """
+        Rebuild the shared file from the database if it is behind the
+        generation counter (or the database). Safe to call from every
+        worker: builds are serialized by a file lock. Returns True if
+        this call wrote a new snapshot.
+        """
+        with self._build_lock:
+            conn = connect(self.db_path)
+            try:
+                generation = self.counter.value()
+                max_id = conn.execute(
+                    "SELECT COALESCE(MAX(id), 0) FROM drugs").fetchone()[0]
+                header = self._read_header()
+                if (not force and header
+                        and header[1] == generation and header[4] == max_id):
+                    return False
+                rows = conn.execute(
+                    f"SELECT batch_key, {', '.join(self.FIELDS)} FROM drugs"
+                    " WHERE batch_key IS NOT NULL").fetchall()
+            finally:
+                conn.close()
+            self._write(rows, generation, max_id)
+            self.rebuilds += 1
+            return True
+
+    def _read_header(self):
+        try:
+            with open(self.path, "rb") as fh:
+                header = HEADER.unpack(fh.read(HEADER.size))
+        except (OSError, struct.error):
+            return None
+        return header if header[0] == MAGIC else None
+
+    def _write(self, rows, generation: int, max_id: int):
+        slots = max(8, 1 << (len(rows) * 2 - 1).bit_length())  # load <= 0.5
+        table = bytearray(slots * SLOT.size)
+        records = bytearray()
+        base = HEADER.size + len(table)
+
+        for key, *fields in rows:
+            drug = dict(zip(self.FIELDS, fields))
+            payload = json.dumps([key, drug], separators=(",", ":")).encode()
+            offset = base + len(records)
+            records += RECORD_LEN.pack(len(payload)) + payload
+
+            h = _hash_key(key)
+            i = h % slots
+            while SLOT.unpack_from(table, i * SLOT.size)[1]:
+                i = (i + 1) % slots
+            SLOT.pack_into(table, i * SLOT.size, h, offset)
+
+        tmp = Path(f"{self.path}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as fh:
+            fh.write(HEADER.pack(MAGIC, generation, slots, len(rows), max_id))
+            fh.write(table)
+            fh.write(records)
+        os.replace(tmp, self.path)
+
+    def schedule_rebuild(self):
+        """
+        Rebuild in a background thread unless one is already running.
+        """
+        if not self._rebuilding.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.build()
+            except Exception as e:
+                print("Registry rebuild failed:", e)
+            finally:
+                self._rebuilding.release()
+
+        threading.Thread(target=run, name="registry-rebuild",
+                         daemon=True).start()
+
+    def notify_write(self):
+        """
+        Record that `drugs` changed: bump the shared generation so every
+        worker stops trusting misses, then refresh the snapshot.
+        Returns the new generation.
+        """
+        generation = self.counter.increment()
+        self.schedule_rebuild()
+        return generation
+
+    # ---------------------------
+    # Lookups
+    # ---------------------------
+
+    def _current_view(self):
+        """
+        Return the mapped snapshot, remapping if another worker replaced
+        the file since we last looked.
+        """
+        view = self._view
+        if view is not None and view[2] == self.counter.value():
+            return view
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            return None
+        if view is None or view[1] != inode:
+            with open(self.path, "rb") as fh:
+                mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, generation, slots, _count, _max_id = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC:
+                return None
+            view = self._view = (mm, inode, generation, slots)
+        return view
+
+    def lookup(self, key: str):
+        """
+        Return the drug dict, None for an authoritative miss, or MISS when
+        the snapshot is unavailable or too old to rule the batch out.
+        """
+        view = self._current_view()
+        if view is None:
+            return MISS
+        mm, _inode, generation, slots = view
+        self.lookups += 1
+
+        h = _hash_key(key)
+        i = h % slots
+        base = HEADER.size
+        while True:
+            slot_hash, offset = SLOT.unpack_from(mm, base + i * SLOT.size)
+            if not offset:
+                break
+            if slot_hash == h:
+                (length,) = RECORD_LEN.unpack_from(mm, offset)
+                start = offset + RECORD_LEN.size
+                stored_key, drug = json.loads(mm[start:start + length])
+                if stored_key == key:
+                    return drug
+            i = (i + 1) % slots
+
+        if generation != self.counter.value():
+            self.stale_lookups += 1
+            self.schedule_rebuild()
+            return MISS
+        return None
+
+    def stats(self) -> dict:
+        header = self._read_header()
+        return {
+            "enabled": True,
+            "path": str(self.path),
+            "generation": self.counter.value(),
+            "snapshot_generation": header[1] if header else None,
+            "entries": header[3] if header else 0,
+            "file_bytes": self.path.stat().st_size if header else 0,
+            "lookups": self.lookups,
+            "stale_lookups": self.stale_lookups,
+            "rebuilds": self.rebuilds,
+        }
+
+
+# Process-wide view; None when the platform lacks file locking
+registry = (
+    RegistryIndex(cfg.REGISTRY_PATH, cfg.DB_PATH)
+    if cfg.REGISTRY_ENABLED and fcntl is not None else None
+)
@@ -1,23 +1,81 @@
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from datetime import datetime, date, timedelta
-from flask import Blueprint, request, send_file, jsonify, url_for, render_template, Response
+from flask import Blueprint, request, send_file, jsonify, url_for, render_template, Response, session, stream_with_context
 from sqlite3 import IntegrityError
-from backend.models import insert_drug
-from backend.database import get_db
+from backend.models import (
+    insert_drug, normalize_batch_key, list_reports, list_reports_today,
+    count_unread_reports, acknowledge_reports, count_unseen_reports,
+    report_page, report_filters, hotspots,
+    SQL_REPORT_COUNTS, SQL_REPORTS_SINCE, SQL_LAST_REPORT_ID,
+)
+from backend.pagination import keyset_page, order_by, page_size, InvalidCursor
+from backend.database import get_db, pool, read_pool, pragma_report, read_snapshot
+from backend.cache import batch_cache, verify_page_cache
+from backend.registry import registry
+from backend.bloom import batch_bloom
+from backend.search import text_search
+from backend.writer import writer, WriteUnavailable
+from backend.throttle import report_throttle
+from backend.exports import (
+    drug_export_rows, write_drugs_pdf, write_drugs_docx, spooled_file,
+    stream_file, dump_chunks, dump_blocks, DUMP_FORMATS, DRUG_DUMP_FIELDS,
+    REPORT_DUMP_FIELDS,
+)
+from backend.events import report_events, reports_generation, sse_message
+from backend.config import get_config
 import qrcode
 import io
+import re
+import time
 import traceback
-from docx import Document
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 from docx.shared import Inches
-from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 
+# Load configuration
+cfg = get_config()
+
 admin_bp = Blueprint("admin_api", __name__)
 
+
+def _drug_filters(conn, search, status, start, end):
+    """
+    Build the FROM/WHERE clause shared by the drugs page and its exports,
+    plus its sort keys (best search match first, then newest).
+    Every predicate compares a bare indexed column against a constant
+    (expiry_on / created_at), so SQLite can use range seeks; the search
+    term goes through the full-text index (see backend.search).
+    """
+    join, where, params, rank = "", "", [], None
+
+    # Search filter
+    if search:
+        join, where, params, rank = text_search(
+            conn, "drugs", search, ("name", "batch_number"))
+
+    base_query = f"FROM drugs {join} WHERE 1=1"
+    if where:
+        base_query += f" AND {where}"
+
+    # Expiry filter
+    if status == "valid":
+        base_query += " AND expiry_on >= date('now','localtime')"
+    elif status == "expired":
+        base_query += " AND expiry_on < date('now','localtime')"
+    elif status == "soon":
+        base_query += " AND expiry_on BETWEEN date('now','localtime') AND date('now','+30 day','localtime')"
+
+    # Date range filter (whole days, inclusive)
+    if start and end:
+        base_query += " AND created_at >= date(?) AND created_at < date(?, '+1 day')"
+        params.extend([start, end])
+
+    # Sort keys, all DESC (see backend.pagination); bm25 ranks are
+    # negative, best first, so the rank is negated
+    keys = ((f"-{rank}",) if rank else ()) + ("drugs.created_at", "drugs.id")
+    return base_query, params, keys
+
+
 # =========================
 # Admin Dashboard
 # =========================
@@ -26,17 +84,9 @@ admin_bp = Blueprint("admin_api", __name__)
 @admin_bp.route('/admin')
 def admin_dashboard():
     try:
-        conn = get_db()
         # Fetch the last 5 reports as a preview
-        rows = conn.execute("""
-            SELECT id, drug_name, batch_number, location, note,
-                   strftime('%Y-%m-%d %H:%M:%S', reported_on) AS reported_on, status
-            FROM reports
-            ORDER BY reported_on DESC
-            LIMIT 5
-        """).fetchall()
-        reports = [dict(r) for r in rows]
-        return render_template('admin.html', reports=reports)
+        reports = [dict(r) for r in list_reports(limit=5)]
+        return render_template('admin.html', reports=reports, live_reports=True)
     except Exception as e:
         print("Error in /admin:", e)
         traceback.print_exc()
@@ -55,6 +105,8 @@ def admin_register():
         required = ["name", "batch_number",
                     "mfg_date", "expiry_date", "manufacturer"]
         missing = [f for f in required if not data.get(f)]
+        if "batch_number" not in missing and not normalize_batch_key(data["batch_number"]):
+            missing.append("batch_number")
         if missing:
             return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
 
@@ -68,6 +120,11 @@ def admin_register():
             )
         except IntegrityError:
             return jsonify({"error": "Batch number already exists"}), 409
+        except WriteUnavailable:
+            resp = jsonify({"error": "Server busy, please try again shortly"})
+            resp.status_code = 503
+            resp.headers["Retry-After"] = str(cfg.REPORT_RETRY_AFTER)
+            return resp
 
         # Encode the correct relative URL for the verify endpoint
         verify_url = f"/verify/{data['batch_number']}"
@@ -85,17 +142,10 @@ def admin_register():
         qr_base64 = base64.b64encode(buf.getvalue()).decode("utf-8")
 
         # Fetch latest reports
-        conn = get_db()
-        rows = conn.execute("""
-            SELECT id, drug_name, batch_number, location, note,
-                   strftime('%Y-%m-%d %H:%M:%S', reported_on) AS reported_on, status
-            FROM reports
-            ORDER BY reported_on DESC
-            LIMIT 5
-        """).fetchall()
-        reports = [dict(r) for r in rows]
+        reports = [dict(r) for r in list_reports(limit=5)]
 
-        return render_template("admin.html", qr_image=qr_base64, reports=reports, scroll='qr')
+        return render_template("admin.html", qr_image=qr_base64, reports=reports,
+                               live_reports=True, scroll='qr')
 
     except Exception as e:
         print("Error in /register:", e)
@@ -110,48 +160,26 @@ def admin_register():
 @admin_bp.get("/drugs")
 def admin_drugs():
     try:
-        conn = get_db()
         search = request.args.get("search", "").strip()
         status = request.args.get(
             "status", "").strip()   # valid, expired, soon
         start = request.args.get("start", "").strip()     # 👈 NEW
         end = request.args.get("end", "").strip()         # 👈 NEW
-        page = int(request.args.get("page", 1))
-        per_page = 20
-        offset = (page - 1) * per_page
-
-        base_query = "FROM drugs WHERE 1=1"
-        params = []
-
-        # Search filter
-        if search:
-            base_query += " AND (name LIKE ? OR batch_number LIKE ?)"
-            params.extend([f"%{search}%", f"%{search}%"])
-
-        # Expiry filter
-        if status == "valid":
-            base_query += " AND date(expiry_date) >= date('now','localtime')"
-        elif status == "expired":
-            base_query += " AND date(expiry_date) < date('now','localtime')"
-        elif status == "soon":
-            base_query += " AND date(expiry_date) BETWEEN date('now','localtime') AND date('now','+30 day','localtime')"
-
-        # Date range filter
-        if start and end:
-            base_query += " AND date(created_at) BETWEEN date(?) AND date(?)"
-            params.extend([start, end])
-
-        # Count + fetch
-        total = conn.execute(
-            f"SELECT COUNT(*) {base_query}", params).fetchone()[0]
-        rows = conn.execute(f"""
-            SELECT name, batch_number, manufacturer, mfg_date, expiry_date, created_at
-            {base_query}
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
-        """, params + [per_page, offset]).fetchall()
-
-        total_pages = (total + per_page - 1) // per_page
+        cursor = request.args.get("cursor") or None
+        per_page = page_size(request.args.get("limit", 20))
+
+        # Count (if asked for) + page from one snapshot, so they agree
+        with read_snapshot() as conn:
+            base_query, params, keys = _drug_filters(
+                conn, search, status, start, end)
+            rows, next_cursor, total = keyset_page(
+                conn,
+                "name, batch_number, manufacturer, mfg_date, expiry_date, created_at",
+                base_query, params, keys,
+                cursor=cursor,
+                limit=per_page,
+                with_total=request.args.get("total") == "1",
+            )
 
         return render_template(
             "admin_drugs.html",
@@ -162,9 +190,12 @@ def admin_drugs():
             end=end,       # 👈 pass to template
             current_date=date.today().isoformat(),
             soon_date=(date.today() + timedelta(days=30)).isoformat(),
-            page=page,
-            total_pages=total_pages
+            cursor=cursor,
+            next_cursor=next_cursor,
+            total=total
         )
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
     except Exception as e:
         print("Error in /drugs:", e)
         traceback.print_exc()
@@ -184,86 +215,28 @@ def export_drugs_word():
         start = request.args.get("start", "").strip()
         end = request.args.get("end", "").strip()
 
-        base_query = "FROM drugs WHERE 1=1"
-        params = []
-
-        if search:
-            base_query += " AND (name LIKE ? OR batch_number LIKE ?)"
-            params.extend([f"%{search}%", f"%{search}%"])
-
-        if status == "valid":
-            base_query += " AND date(expiry_date) >= date('now','localtime')"
-        elif status == "expired":
-            base_query += " AND date(expiry_date) < date('now','localtime')"
-        elif status == "soon":
-            base_query += " AND date(expiry_date) BETWEEN date('now','localtime') AND date('now','+30 day','localtime')"
-
-        if start and end:
-            base_query += " AND date(created_at) BETWEEN date(?) AND date(?)"
-            params.extend([start, end])
-
-        rows = conn.execute(f"""
-            SELECT name, batch_number, manufacturer, mfg_date, expiry_date, created_at
-            {base_query}
-            ORDER BY created_at DESC
-        """, params).fetchall()
-
-        today = date.today()
-        soon = today + timedelta(days=30)
-
-        def safe(val):
-            return str(val) if val is not None else "N/A"
-
-        doc = Document()
-        doc.add_heading("Registered Drugs Report", 0)
-
-        table = doc.add_table(rows=1, cols=7)
-        table.style = "Table Grid"
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = "Name"
-        hdr_cells[1].text = "Batch Number"
-        hdr_cells[2].text = "Manufacturer"
-        hdr_cells[3].text = "Mfg Date"
-        hdr_cells[4].text = "Expiry Date"
-        hdr_cells[5].text = "Status"
-        hdr_cells[6].text = "Registered On"
-
-        for row in rows:
-            try:
-                exp_date = datetime.strptime(
-                    safe(row["expiry_date"]), "%Y-%m-%d").date()
-            except Exception:
-                exp_date = today
-
-            if exp_date < today:
-                status_label = "Expired"
-            elif exp_date <= soon:
-                status_label = "Expiring Soon"
-            else:
-                status_label = "Valid"
-
-            cells = table.add_row().cells
-            cells[0].text = safe(row["name"])
-            cells[1].text = safe(row["batch_number"])
-            cells[2].text = safe(row["manufacturer"])
-            cells[3].text = safe(row["mfg_date"])
-            cells[4].text = safe(row["expiry_date"])
-            cells[5].text = status_label
-            cells[6].text = safe(row["created_at"])
-
-        doc.add_paragraph()
-        generated_on = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        doc.add_paragraph(f"Generated on {generated_on} by Admin System")
-
-        buf = io.BytesIO()
-        doc.save(buf)
-        buf.seek(0)
+        base_query, params, keys = _drug_filters(
+            conn, search, status, start, end)
 
-        return send_file(
-            buf,
+        # Rows are written straight into document.xml (see backend.exports)
+        out = spooled_file()
+        generated_on = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            write_drugs_docx(
+                drug_export_rows(conn, base_query, params, order_by(keys)),
+                out, generated_on)
+            size = out.tell()
+        except Exception:
+            out.close()
+            raise
+
+        return Response(
+            stream_file(out),
             mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            download_name="registered_drugs.docx",
-            as_attachment=True
+            headers={
+                "Content-Disposition": 'attachment; filename="registered_drugs.docx"',
+                "Content-Length": str(size),
+            },
         )
     except Exception as e:
         print("Error exporting Word:", e)
@@ -284,107 +257,130 @@ def export_drugs_pdf():
         start = request.args.get("start", "").strip()
         end = request.args.get("end", "").strip()
 
-        base_query = "FROM drugs WHERE 1=1"
-        params = []
+        base_query, params, keys = _drug_filters(
+            conn, search, status, start, end)
 
-        if search:
-            base_query += " AND (name LIKE ? OR batch_number LIKE ?)"
-            params.extend([f"%{search}%", f"%{search}%"])
+        # Built chunk by chunk into a spooled file, then streamed out
+        out = spooled_file()
+        generated_on = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            write_drugs_pdf(
+                drug_export_rows(conn, base_query, params, order_by(keys)),
+                out, generated_on)
+            size = out.tell()
+        except Exception:
+            out.close()
+            raise
+
+        return Response(
+            stream_file(out),
+            mimetype="application/pdf",
+            headers={
+                "Content-Disposition": 'attachment; filename="registered_drugs.pdf"',
+                "Content-Length": str(size),
+            },
+        )
+    except Exception as e:
+        print("Error exporting PDF:", e)
+        traceback.print_exc()
+        return jsonify({"error": "Failed to export PDF"}), 500
 
-        if status == "valid":
-            base_query += " AND date(expiry_date) >= date('now','localtime')"
-        elif status == "expired":
-            base_query += " AND date(expiry_date) < date('now','localtime')"
-        elif status == "soon":
-            base_query += " AND date(expiry_date) BETWEEN date('now','localtime') AND date('now','+30 day','localtime')"
+# =========================
+# Export Drugs / Reports (CSV, NDJSON)
+# =========================
 
-        if start and end:
-            base_query += " AND date(created_at) BETWEEN date(?) AND date(?)"
-            params.extend([start, end])
 
-        rows = conn.execute(f"""
-            SELECT name, batch_number, manufacturer, mfg_date, expiry_date, created_at
-            {base_query}
-            ORDER BY created_at DESC
-        """, params).fetchall()
+def _dump_response(fmt, name, fields, from_where, params, keys):
+    """
+    Stream `SELECT fields from_where` as CSV or NDJSON, gzipped with
+    ?gzip=1. The query runs here so a bad one still gets a 500.
+    """
+    select, columns = fields
+    cursor = get_db().execute(
+        f"SELECT {select} {from_where} {order_by(keys)}", params)
+    gzip = request.args.get("gzip") == "1"
+    mimetype, extension = DUMP_FORMATS[fmt]
+    filename = f"{name}.{extension}" + (".gz" if gzip else "")
+
+    return Response(
+        stream_with_context(
+            dump_blocks(fmt, columns, dump_chunks(cursor), gzip=gzip)),
+        mimetype="application/gzip" if gzip else mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@admin_bp.get("/drugs/export/<any(csv, ndjson):fmt>")
+def export_drugs_dump(fmt):
+    try:
+        conn = get_db()
+        search = request.args.get("search", "").strip()
+        status = request.args.get("status", "").strip()
+        start = request.args.get("start", "").strip()
+        end = request.args.get("end", "").strip()
 
-        buf = io.BytesIO()
-        doc = SimpleDocTemplate(buf, pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
-
-        # Title
-        elements.append(Paragraph("Registered Drugs Report", styles["Title"]))
-        elements.append(Spacer(1, 12))
-
-        # Table data with Status
-        data = [["Name", "Batch Number", "Manufacturer",
-                 "Mfg Date", "Expiry Date", "Status", "Registered On"]]
-        today = date.today()
-        soon = today + timedelta(days=30)
-
-        for row in rows:
-            if row["expiry_date"] < today.isoformat():
-                status_label = "Expired"
-            elif row["expiry_date"] <= soon.isoformat():
-                status_label = "Expiring Soon"
-            else:
-                status_label = "Valid"
-
-            data.append([
-                row["name"], row["batch_number"], row["manufacturer"],
-                row["mfg_date"], row["expiry_date"], status_label, row["created_at"]
-            ])
-
-        # Styled table
-        table = Table(data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f4f4f4")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
-            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTSIZE", (0, 0), (-1, 0), 11),
-            ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-            ("BOX", (0, 0), (-1, -1), 1, colors.black),
-        ]))
-
-        elements.append(table)
-        elements.append(Spacer(1, 20))
-
-        # Footer
-        generated_on = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        footer_text = f"Generated on {generated_on} by Admin System"
-        elements.append(Paragraph(footer_text, styles["Normal"]))
+        base_query, params, keys = _drug_filters(
+            conn, search, status, start, end)
+        return _dump_response(fmt, "registered_drugs", DRUG_DUMP_FIELDS,
+                              base_query, params, keys)
+    except Exception as e:
+        print(f"Error exporting drugs ({fmt}):", e)
+        traceback.print_exc()
+        return jsonify({"error": f"Failed to export {fmt.upper()}"}), 500
 
-        doc.build(elements)
-        buf.seek(0)
 
-        return send_file(buf, mimetype="application/pdf",
-                         download_name="registered_drugs.pdf", as_attachment=True)
+@admin_bp.get("/reports/export/<any(csv, ndjson):fmt>")
+def export_reports_dump(fmt):
+    try:
+        search = request.args.get("search", "").strip()
+        start = request.args.get("start", "").strip()
+        end = request.args.get("end", "").strip()
+
+        from_where, params, keys = report_filters(get_db(), search, start, end)
+        return _dump_response(fmt, "reports", REPORT_DUMP_FIELDS,
+                              from_where, params, keys)
     except Exception as e:
-        print("Error exporting PDF:", e)
+        print(f"Error exporting reports ({fmt}):", e)
         traceback.print_exc()
-        return jsonify({"error": "Failed to export PDF"}), 500
+        return jsonify({"error": f"Failed to export {fmt.upper()}"}), 500
 
 # =========================
 # Reports (All)
 # =========================
 
 
+def _render_report_page(endpoint, start="", end=""):
+    """
+    Render one keyset page of reports on the dashboard, with Next/First
+    links that keep the current filters (?limit=, ?total=1 also apply).
+    """
+    cursor = request.args.get("cursor") or None
+    try:
+        rows, next_cursor, total = report_page(
+            start=start, end=end, cursor=cursor,
+            limit=page_size(request.args.get("limit")),
+            with_total=request.args.get("total") == "1")
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    page_args = {k: v for k, v in request.args.items()
+                 if k not in ("cursor", "scroll")}
+    # Live updates add new reports on top: only right on the first,
+    # unfiltered page
+    live = not (cursor or start or end)
+    return render_template("admin.html", reports=rows, scroll='reports',
+                           cursor=cursor, next_cursor=next_cursor, total=total,
+                           page_endpoint=endpoint, page_args=page_args,
+                           live_reports=live)
+
+
 @admin_bp.get("/reports")
 def admin_reports():
     try:
-        conn = get_db()
-        rows = conn.execute("""
-            SELECT id, drug_name, batch_number, location, note,
-                   strftime('%Y-%m-%d %H:%M:%S', reported_on) AS reported_on, status
-            FROM reports
-            ORDER BY reported_on DESC, id DESC
-        """).fetchall()
-        conn.execute("UPDATE reports SET status = 1 WHERE status = 0")
-        conn.commit()
-        return render_template("admin.html", reports=rows, scroll='reports')
+        page = _render_report_page("admin_api.admin_reports")
+        if not request.args.get("cursor"):
+            acknowledge_reports(session["admin_id"])
+        return page
     except Exception as e:
         print("Error in /reports:", e)
         traceback.print_exc()
@@ -398,15 +394,8 @@ def admin_reports():
 @admin_bp.get("/reports/today")
 def admin_reports_today():
     try:
-        conn = get_db()
-        rows = conn.execute("""
-            SELECT id, drug_name, batch_number, location, note,
-                   strftime('%Y-%m-%d %H:%M:%S', reported_on) AS reported_on, status
-            FROM reports
-            WHERE date(reported_on) = date('now','localtime')
-            ORDER BY reported_on DESC, id DESC
-        """).fetchall()
-        return render_template("admin.html", reports=rows, scroll='reports')
+        today = date.today().isoformat()
+        return _render_report_page("admin_api.admin_reports_today", today, today)
     except Exception as e:
         print("Error in /reports/today:", e)
         traceback.print_exc()
@@ -426,16 +415,7 @@ def admin_reports_range():
         if not start or not end:
             return jsonify({"error": "Please provide start and end dates (YYYY-MM-DD)"}), 400
 
-        conn = get_db()
-        rows = conn.execute("""
-            SELECT id, drug_name, batch_number, location, note,
-                   strftime('%Y-%m-%d %H:%M:%S', reported_on) AS reported_on, status
-            FROM reports
-            WHERE date(reported_on) BETWEEN date(?) AND date(?)
-            ORDER BY reported_on DESC, id DESC
-        """, (start, end)).fetchall()
-
-        return render_template("admin.html", reports=rows, scroll='reports')
+        return _render_report_page("admin_api.admin_reports_range", start, end)
     except Exception as e:
         print("Error in /reports/range:", e)
         traceback.print_exc()
@@ -449,14 +429,10 @@ def admin_reports_range():
 @admin_bp.get("/reports/count")
 def reports_count():
     try:
-        conn = get_db()
-        row = conn.execute("""
-            SELECT COUNT(*) AS total
-            FROM reports
-            WHERE status = 0
-              AND date(reported_on) = date('now','localtime')
-        """).fetchone()
-        return jsonify({"count": row["total"]})
+        return jsonify({
+            "count": count_unread_reports(today_only=True),
+            "unseen": count_unseen_reports(session["admin_id"]),
+        })
     except Exception as e:
         print("Error in /reports/count:", e)
         traceback.print_exc()
@@ -470,17 +446,137 @@ def reports_count():
 @admin_bp.get("/reports/preview")
 def reports_preview():
     try:
-        conn = get_db()
-        rows = conn.execute("""
-            SELECT id, drug_name, batch_number, location, note,
-                   strftime('%Y-%m-%d %H:%M:%S', reported_on) AS reported_on, status
-            FROM reports
-            WHERE date(reported_on) = date('now','localtime')
-            ORDER BY reported_on DESC
-            LIMIT 5
-        """).fetchall()
-        return jsonify([dict(r) for r in rows])
+        return jsonify([dict(r) for r in list_reports_today(limit=5)])
     except Exception as e:
         print("Error in /reports/preview:", e)
         traceback.print_exc()
         return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+# =========================
+# Counterfeit Hotspots (Top Batches by Location)
+# =========================
+
+
+@admin_bp.get("/hotspots")
+def admin_hotspots():
+    """
+    ?window=24h (hours) or 7d (days), ?k=10, ?baseline=<windows>,
+    ?order=spike|count.
+    """
+    try:
+        window = re.fullmatch(r"(\d+)([hd])", request.args.get("window", "24h"))
+        order = request.args.get("order", "spike")
+        if not window or int(window.group(1)) < 1 or order not in ("spike", "count"):
+            return jsonify({"error": "Invalid window or order"}), 400
+        span, grain = int(window.group(1)), window.group(2)
+        k = max(1, min(request.args.get("k", 10, type=int), cfg.HOTSPOT_TOP_MAX))
+        baseline = request.args.get("baseline", type=int)
+        if baseline is not None and baseline < 1:
+            return jsonify({"error": "Invalid baseline"}), 400
+
+        return jsonify({
+            "window": f"{span}{grain}",
+            "hotspots": hotspots(grain, span, k, baseline, order),
+        })
+    except Exception as e:
+        print("Error in /hotspots:", e)
+        traceback.print_exc()
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+# =========================
+# Live Report Events (Server-Sent Events)
+# =========================
+
+
+def _report_snapshot(after_id):
+    """
+    Badge counts plus reports newer than `after_id`, on a short-lived
+    read-only connection (a stream must not pin a request snapshot).
+    """
+    today = date.today().isoformat()
+    conn = read_pool.acquire()
+    try:
+        total, unread = conn.execute(
+            SQL_REPORT_COUNTS, ("all",)).fetchone() or (0, 0)
+        _, unread_today = conn.execute(
+            SQL_REPORT_COUNTS, (today,)).fetchone() or (0, 0)
+        if after_id is None:
+            rows = []
+            last_id = conn.execute(SQL_LAST_REPORT_ID).fetchone()[0]
+        else:
+            rows = [dict(r) for r in conn.execute(
+                SQL_REPORTS_SINCE, (after_id, 50)).fetchall()]
+            last_id = rows[-1]["id"] if rows else after_id
+    finally:
+        read_pool.release(conn)
+    return {
+        "unread": unread,
+        "unread_today": unread_today,
+        "total": total,
+        "reports": rows,
+    }, last_id
+
+
+@admin_bp.get("/events")
+def admin_events():
+    """
+    Push report activity to the dashboard: a `reports` event with the
+    badge counts and any new reports whenever `reports` changes in any
+    worker. The stream ends after SSE_MAX_SECONDS (so a sync worker is
+    never held for long) and the browser reconnects after `retry`,
+    resuming from Last-Event-ID.
+    """
+    resume = request.headers.get("Last-Event-ID", "")
+    after_id = int(resume) if resume.isdigit() else None
+
+    def stream():
+        payload, last_id = _report_snapshot(after_id)
+        yield sse_message("reports", payload, last_id, cfg.SSE_RETRY_MS)
+
+        seen = reports_generation()
+        last_counts = {k: payload[k] for k in ("unread", "unread_today", "total")}
+        deadline = time.monotonic() + cfg.SSE_MAX_SECONDS
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            time.sleep(cfg.SSE_POLL_INTERVAL)
+            generation = reports_generation()
+            if report_events is not None and generation == seen:
+                if time.monotonic() - last_sent >= cfg.SSE_KEEPALIVE:
+                    last_sent = time.monotonic()
+                    yield ": keep-alive\n\n"
+                continue
+            seen = generation
+
+            payload, last_id = _report_snapshot(last_id)
+            counts = {k: payload[k] for k in ("unread", "unread_today", "total")}
+            if payload["reports"] or counts != last_counts:
+                last_counts = counts
+                last_sent = time.monotonic()
+                yield sse_message("reports", payload, last_id)
+            elif time.monotonic() - last_sent >= cfg.SSE_KEEPALIVE:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # don't let nginx buffer the stream
+    })
+
+# =========================
+# Runtime Metrics (per worker)
+# =========================
+
+
+@admin_bp.get("/metrics")
+def admin_metrics():
+    return jsonify({
+        "db_pool": pool.stats(),
+        "db_read_pool": read_pool.stats(),
+        "db_pragmas": pragma_report(get_db()),
+        "batch_cache": batch_cache.stats(),
+        "verify_page_cache": verify_page_cache.stats(),
+        "registry": registry.stats() if registry is not None else {"enabled": False},
+        "bloom": batch_bloom.stats() if batch_bloom is not None else {"enabled": False},
+        "writer": writer.stats(),
+        "report_throttle": report_throttle.stats(),
+    })
@@ -1,6 +1,11 @@
 from flask import Blueprint, request, jsonify
 from sqlite3 import IntegrityError
-from backend.models import insert_drug
+from backend.config import get_config
+from backend.models import insert_drug, normalize_batch_key
+from backend.writer import WriteUnavailable
+
+# Load configuration
+cfg = get_config()
 
 register_bp = Blueprint("register_api", __name__)
 
@@ -11,6 +16,8 @@ def public_register():
     required = ["name", "batch_number",
                 "mfg_date", "expiry_date", "manufacturer"]
     missing = [f for f in required if not data.get(f)]
+    if "batch_number" not in missing and not normalize_batch_key(data["batch_number"]):
+        missing.append("batch_number")
     if missing:
         return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
 
@@ -24,5 +31,10 @@ def public_register():
         )
     except IntegrityError:
         return jsonify({"error": "Batch number already exists"}), 409
+    except WriteUnavailable:
+        resp = jsonify({"error": "Server busy, please try again shortly"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(cfg.REPORT_RETRY_AFTER)
+        return resp
 
     return jsonify({"message": "Batch registered successfully"})
@@ -1,9 +1,31 @@
 from flask import Blueprint, jsonify, request
-from backend.database import get_db
-from datetime import datetime
+from backend.config import get_config
+from backend.models import (
+    submit_report, await_report, fold_duplicate, mark_checked,
+    normalize_batch_key, count_unread_reports, report_page,
+)
+from backend.pagination import page_size, InvalidCursor
+from backend.writer import QueueFull, WriteUnavailable
+from backend.throttle import (
+    report_throttle, client_fingerprint, submission_key, write_failed,
+)
+
+# Load configuration
+cfg = get_config()
 
 report_bp = Blueprint("report_api", __name__)
 
+
+def _try_again_later():
+    """
+    503 + Retry-After for a report that could not be stored right now.
+    """
+    resp = jsonify({"message": "⏳ We're receiving a lot of reports right "
+                             "now. Please try again shortly."})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(cfg.REPORT_RETRY_AFTER)
+    return resp
+
 # =========================
 # POST: Save a new counterfeit report
 # =========================
@@ -17,61 +39,89 @@ def create_report():
     location = data.get("location")
     note = data.get("note")
 
-    if not batch_number:
+    # Numeric batch numbers are stored as text, as they always were
+    if isinstance(batch_number, (int, float)) and not isinstance(batch_number, bool):
+        batch_number = str(batch_number)
+    if not isinstance(batch_number, str) or not normalize_batch_key(batch_number):
         return jsonify({"message": "❌ Batch number is required"}), 400
 
-    conn = get_db()
-    conn.execute(
-        """
-        INSERT INTO reports (drug_name, batch_number, location, note, reported_on, status)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (drug_name, batch_number, location, note, datetime.now(), 0)  # 0 = New
-    )
-    conn.commit()
+    throttle_key = None
+    if cfg.REPORT_DEDUP_MODE != "off":
+        throttle_key = submission_key(
+            normalize_batch_key(batch_number), location,
+            client_fingerprint(request.remote_addr,
+                               request.headers.get("User-Agent")))
+        duplicate, original = report_throttle.admit(throttle_key)
+        if duplicate:
+            if cfg.REPORT_DEDUP_MODE == "reject":
+                resp = jsonify({"message": "⏳ This report was already received. "
+                                           "Please wait before submitting it again."})
+                resp.status_code = 429
+                resp.headers["Retry-After"] = str(
+                    report_throttle.retry_after(throttle_key))
+                return resp
+            if original is not None and not write_failed(original):
+                fold_duplicate(original)
+                return jsonify({"message": "🚨 Report received. Thank you for "
+                                           "helping keep patients safe.",
+                                "duplicate": True}), 200
+            # The original is not queued yet, or failed: store this one
+            # (the key stays with the original's request)
+            throttle_key = None
+
+    try:
+        future = submit_report(batch_number.strip(), location, note,
+                               drug_name=drug_name)
+    except QueueFull:
+        if throttle_key is not None:
+            report_throttle.forget(throttle_key)
+        return _try_again_later()
+    if throttle_key is not None:
+        report_throttle.attach(throttle_key, future)
+
+    try:
+        committed = await_report(future)
+    except Exception as e:
+        # The writer job failed (e.g. lock timeout); nothing was stored
+        print("Error storing report:", e)
+        if throttle_key is not None:
+            report_throttle.forget(throttle_key)
+        return _try_again_later()
 
-    return jsonify({"message": "🚨 Report received. Thank you for helping keep patients safe."}), 201
+    # 202 when the report is queued but not yet committed
+    return jsonify({"message": "🚨 Report received. Thank you for helping "
+                               "keep patients safe."}), 201 if committed else 202
 
 
 # =========================
 # GET: Fetch counterfeit reports (supports search & date filters)
+# Keyset-paginated: ?limit=, ?cursor=<next_cursor>, ?total=1
 # =========================
 @report_bp.get("/report")
 def get_reports():
-    conn = get_db()
     search = request.args.get("search", "").strip()
     start = request.args.get("start", "").strip()
     end = request.args.get("end", "").strip()
 
-    query = """
-        SELECT id, drug_name, batch_number, location, note, reported_on, status
-        FROM reports
-        WHERE 1=1
-    """
-    params = []
-
-    # Optional search filter
-    if search:
-        query += " AND (drug_name LIKE ? OR batch_number LIKE ? OR location LIKE ? OR note LIKE ?)"
-        params.extend([f"%{search}%"] * 4)
-
-    # Optional date range filter
-    if start and end:
-        query += " AND date(reported_on) BETWEEN date(?) AND date(?)"
-        params.extend([start, end])
-
-    query += " ORDER BY reported_on DESC"
-
-    rows = conn.execute(query, params).fetchall()
-
-    # Convert rows to dicts
-    reports = []
-    for row in rows:
-        r = dict(row)
+    try:
+        rows, next_cursor, total = report_page(
+            search, start, end,
+            cursor=request.args.get("cursor") or None,
+            limit=page_size(request.args.get("limit")),
+            with_total=request.args.get("total") == "1",
+            fields=("id, drug_name, batch_number, location, note, "
+                    "reported_on, status, duplicate_count"),
+        )
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    for r in rows:
         r["status_label"] = "New" if r["status"] == 0 else "Checked"
-        reports.append(r)
 
-    return jsonify(reports)
+    body = {"reports": rows, "next_cursor": next_cursor}
+    if total is not None:
+        body["total"] = total
+    return jsonify(body)
 
 
 # =========================
@@ -80,11 +130,11 @@ def get_reports():
 @report_bp.post("/report/<int:report_id>/mark_checked")
 def mark_report_checked(report_id):
     try:
-        conn = get_db()
-        conn.execute(
-            "UPDATE reports SET status = 1 WHERE id = ?", (report_id,))
-        conn.commit()
+        if not mark_checked(report_id):
+            return jsonify({"error": "Report not found"}), 404
         return jsonify({"success": True})
+    except WriteUnavailable:
+        return _try_again_later()
     except Exception as e:
         print("Error updating report status:", e)
         return jsonify({"error": "Failed to update status"}), 500
@@ -95,7 +145,4 @@ def mark_report_checked(report_id):
 # =========================
 @report_bp.get("/report/count")
 def count_new_reports():
-    conn = get_db()
-    row = conn.execute(
-        "SELECT COUNT(*) as count FROM reports WHERE status = 0").fetchone()
-    return jsonify({"count": row["count"] if row else 0})
+    return jsonify({"count": count_unread_reports()})
@@ -1,9 +1,57 @@
-from flask import Blueprint, render_template, request, redirect, url_for
-from backend.database import get_db
-from datetime import datetime
+from flask import (
+    Blueprint, render_template, request, redirect, url_for, jsonify,
+    Response, stream_with_context
+)
+from markupsafe import escape
+from backend.models import (
+    get_drug_by_batch, get_drugs_by_batches, normalize_batch_key,
+    registry_generation
+)
+from backend.cache import verify_page_cache
+from backend.database import read_only
+from backend.config import get_config
+from datetime import datetime, date, time, timedelta
+import hashlib
+import json
 
 verify_bp = Blueprint("verify", __name__)
 
+# JSON API (registered under /api)
+verify_api_bp = Blueprint("verify_api", __name__)
+
+# Load configuration
+cfg = get_config()
+
+NOT_FOUND_MESSAGE = "❌ Batch number not found in the system."
+
+# Placeholder rendered into cached verify pages, swapped per request
+VERIFIED_ON_SLOT = "@@MEDGUARD_VERIFIED_ON@@"
+
+
+def expiry_of(drug):
+    """
+    A drug's expiry date, or None if it is missing or malformed.
+    """
+    return date.fromisoformat(drug["expiry_on"]) if drug.get("expiry_on") else None
+
+
+def batch_status(drug, today=None) -> str:
+    """
+    Classify a lookup result as 'notfound', 'expired' or 'valid'.
+    A batch is valid through its expiry date; unparseable dates count as valid.
+    Compares the precomputed ISO `expiry_on` string, so nothing is parsed.
+    """
+    if not drug:
+        return "notfound"
+    expiry_on = drug.get("expiry_on")
+    if expiry_on and expiry_on < (today or date.today()).isoformat():
+        return "expired"
+    return "valid"
+
+
+def expired_message(drug) -> str:
+    return f"⚠️ Batch {drug['batch_number']} has expired on {drug['expiry_date']}."
+
 # Handle POST from index.html form
 
 
@@ -26,51 +74,23 @@ def verify_from_form():
     return redirect(url_for("verify.verify_batch", batch_number=batch_number))
 
 
-# Handle GET /verify/<batch_number>
-@verify_bp.route("/verify/<batch_number>")
-def verify_batch(batch_number):
-    conn = get_db()
-    batch_number = batch_number.strip()
-
-    # Try both INT and TEXT storage cases
-    try:
-        batch_val = int(batch_number)
-    except ValueError:
-        batch_val = batch_number
-
-    row = conn.execute("""
-        SELECT name AS drug_name, batch_number, mfg_date, expiry_date, manufacturer
-        FROM drugs
-        WHERE batch_number = ?
-    """, (batch_val,)).fetchone()
-
-    verified_on_str = datetime.now().strftime(
-        "%B %d, %Y at %I:%M %p") + " in Lagos, Nigeria"
-
+def _render_verify_page(row, status: str, verified_on: str) -> str:
     # Case 1: Not found
-    if not row:
+    if status == "notfound":
         return render_template(
             "verify.html",
-            error="❌ Batch number not found in the system.",
-            verified_on=verified_on_str,
+            error=NOT_FOUND_MESSAGE,
+            verified_on=verified_on,
             status="notfound",
             batch=None
         )
 
     # Case 2: Expired
-    expiry_date = None
-    try:
-        expiry_date = datetime.strptime(
-            str(row["expiry_date"]), "%Y-%m-%d").date()
-    except Exception:
-        pass
-
-    today = datetime.today().date()
-    if expiry_date and expiry_date < today:
+    if status == "expired":
         return render_template(
             "verify.html",
-            error=f"⚠️ Batch {row['batch_number']} has expired on {row['expiry_date']}.",
-            verified_on=verified_on_str,
+            error=expired_message(row),
+            verified_on=verified_on,
             status="expired",
             batch=row
         )
@@ -79,7 +99,175 @@ def verify_batch(batch_number):
     return render_template(
         "verify.html",
         batch=row,
-        verified_on=verified_on_str,
+        verified_on=verified_on,
         status="valid",
         error=None
     )
+
+
+# Handle GET /verify/<batch_number>
+@verify_bp.route("/verify/<batch_number>")
+def verify_batch(batch_number):
+    batch_number = batch_number.strip()
+
+    # Cached lookup on the normalized batch key
+    key = normalize_batch_key(batch_number)
+    drug = get_drug_by_batch(batch_number)
+    row = dict(drug, drug_name=drug["name"]) if drug else None
+
+    verified_on_str = datetime.now().strftime(
+        "%B %d, %Y at %I:%M %p") + " in Lagos, Nigeria"
+    today = date.today()
+    status = batch_status(row, today)
+
+    # The page only depends on the row, its status and the day, so the
+    # rendered body is cached with a slot for the per-request timestamp.
+    # Not-found pages are also tied to the registry generation, and not
+    # cached at all without one (another worker may register the batch).
+    generation = registry_generation() if status == "notfound" else None
+    cacheable = status != "notfound" or generation is not None
+    variant = (status, today.isoformat(), generation)
+    html = verify_page_cache.get(key, variant) if cacheable else None
+    if html is None:
+        html = _render_verify_page(row, status, VERIFIED_ON_SLOT)
+        if cacheable:
+            verify_page_cache.put(key, variant, html)
+    return html.replace(VERIFIED_ON_SLOT, str(escape(verified_on_str)))
+
+
+# =========================
+# JSON: GET /api/verify/<batch_number>
+# =========================
+def _max_age(drug, status: str) -> int:
+    """
+    How long a verification result may be cached. Valid results never
+    outlive the batch's expiry date; misses are kept short because the
+    batch may be registered at any time.
+    """
+    if status == "notfound":
+        return cfg.VERIFY_NOTFOUND_MAX_AGE
+    if status == "valid":
+        expiry_date = expiry_of(drug)
+        if expiry_date:
+            expires_at = datetime.combine(
+                expiry_date + timedelta(days=1), time.min)
+            remaining = int((expires_at - datetime.now()).total_seconds())
+            return max(0, min(cfg.VERIFY_MAX_AGE, remaining))
+    return cfg.VERIFY_MAX_AGE
+
+
+def _payload(batch_number: str, drug, status: str) -> dict:
+    if status == "notfound":
+        return {
+            "batch_number": batch_number,
+            "status": status,
+            "message": NOT_FOUND_MESSAGE,
+        }
+    return {
+        "drug_name": drug["name"],
+        "batch_number": drug["batch_number"],
+        "mfg_date": drug["mfg_date"],
+        "expiry_date": drug["expiry_date"],
+        "manufacturer": drug["manufacturer"],
+        "status": status,
+        "message": expired_message(drug) if status == "expired"
+        else "✅ Batch is registered and within its expiry date.",
+    }
+
+
+@verify_api_bp.get("/verify/<batch_number>")
+def verify_batch_json(batch_number):
+    batch_number = batch_number.strip()
+    drug = get_drug_by_batch(batch_number)
+    status = batch_status(drug)
+
+    response = jsonify(_payload(batch_number, drug, status))
+    response.set_etag(hashlib.sha256(response.get_data()).hexdigest())
+    response.cache_control.public = True
+    response.cache_control.max_age = _max_age(drug, status)
+    return response.make_conditional(request)
+
+
+# =========================
+# NDJSON: POST /api/verify/bulk
+# =========================
+class _BadItem(dict):
+    """
+    Error record standing in for an input item that cannot be looked up.
+    A type of its own, so dicts posted by the client are never echoed.
+    """
+
+
+def _stream_batch_numbers():
+    """
+    Read an NDJSON / plain-text body (one batch per line) incrementally
+    from the request stream. A line that cannot be read yields a _BadItem
+    in its place, since the response is already under way.
+    """
+    for line_no, line in enumerate(request.stream, 1):
+        try:
+            line = line.decode("utf-8").strip()
+            if line.startswith('"'):
+                line = json.loads(line)
+        except ValueError:
+            yield _BadItem(line=line_no, error="Invalid line: expected a batch number or a JSON string")
+            continue
+        if line:
+            yield line
+
+
+def _chunked(batch_numbers, size: int):
+    """
+    Group the input into lists of `size` items. Anything other than a
+    string becomes a _BadItem instead of being looked up.
+    """
+    chunk = []
+    for i, batch_number in enumerate(batch_numbers):
+        if isinstance(batch_number, str):
+            batch_number = batch_number.strip()
+        elif not isinstance(batch_number, _BadItem):
+            batch_number = _BadItem(index=i, error="Batch numbers must be strings")
+        chunk.append(batch_number)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@verify_api_bp.post("/verify/bulk")
+@read_only
+def verify_bulk():
+    if request.mimetype in ("application/x-ndjson", "text/plain"):
+        batch_numbers = _stream_batch_numbers()
+    else:
+        data = request.get_json(silent=True)
+        batch_numbers = data.get("batch_numbers") if isinstance(
+            data, dict) else data
+        if not isinstance(batch_numbers, list):
+            return jsonify({"error": "Expected a JSON list or {\"batch_numbers\": [...]}"}), 400
+        if len(batch_numbers) > cfg.VERIFY_BULK_MAX:
+            return jsonify({"error": f"At most {cfg.VERIFY_BULK_MAX} batch numbers per request"}), 413
+
+    today = date.today()
+
+    def generate():
+        seen = 0
+        for chunk in _chunked(batch_numbers, cfg.VERIFY_BULK_CHUNK):
+            # One IN (...) query per chunk, answered in request order
+            found = get_drugs_by_batches(
+                [b for b in chunk if isinstance(b, str)])
+            for batch_number in chunk:
+                seen += 1
+                if seen > cfg.VERIFY_BULK_MAX:
+                    yield json.dumps({"error": f"Truncated at {cfg.VERIFY_BULK_MAX} batch numbers"}) + "\n"
+                    return
+                if isinstance(batch_number, _BadItem):
+                    yield json.dumps(batch_number) + "\n"
+                    continue
+                drug = found.get(normalize_batch_key(batch_number))
+                status = batch_status(drug, today)
+                yield json.dumps(_payload(batch_number, drug, status)) + "\n"
+
+    return Response(stream_with_context(generate()),
+                    mimetype="application/x-ndjson")
@@ -2,8 +2,10 @@ CREATE TABLE IF NOT EXISTS drugs (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT NOT NULL,
     batch_number TEXT UNIQUE NOT NULL,
+    batch_key TEXT,
     mfg_date TEXT NOT NULL,
     expiry_date TEXT NOT NULL,
+    expiry_on TEXT,
     manufacturer TEXT NOT NULL,
     created_at TEXT DEFAULT (datetime('now'))
 );
@@ -12,16 +14,62 @@ CREATE TABLE IF NOT EXISTS reports (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     drug_name TEXT,
     batch_number TEXT NOT NULL,
+    batch_key TEXT,
     location TEXT,
     note TEXT,
     reported_on TIMESTAMP DEFAULT (datetime('now')),
-    status INTEGER DEFAULT 0
+    status INTEGER DEFAULT 0,
+    duplicate_count INTEGER NOT NULL DEFAULT 0
 );
 
+CREATE UNIQUE INDEX IF NOT EXISTS idx_drugs_batch_key ON drugs(batch_key);
+CREATE INDEX IF NOT EXISTS idx_reports_batch_key ON reports(batch_key);
+CREATE INDEX IF NOT EXISTS idx_reports_status_reported_on ON reports(status, reported_on);
+CREATE INDEX IF NOT EXISTS idx_reports_reported_on ON reports(reported_on);
+CREATE INDEX IF NOT EXISTS idx_drugs_expiry_on ON drugs(expiry_on);
+CREATE INDEX IF NOT EXISTS idx_drugs_created_at ON drugs(created_at);
+
+-- Full-text search (trigram FTS5, external content; see migrations.create_fts)
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+    drug_name, batch_number, location, note,
+    content='reports', content_rowid='id', tokenize='trigram'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS drugs_fts USING fts5(
+    name, batch_number,
+    content='drugs', content_rowid='id', tokenize='trigram'
+);
+-- plus reports_fts_ai/_ad/_au and drugs_fts_ai/_ad/_au sync triggers
+
+-- Badge counts per bucket ('all' or a YYYY-MM-DD report day), kept current
+-- by the report_counters_ai/_ad/_au triggers on reports
+CREATE TABLE IF NOT EXISTS report_counters (
+    bucket TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0,
+    unread INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
 CREATE TABLE IF NOT EXISTS admin_users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     email TEXT UNIQUE NOT NULL,
     password_hash TEXT NOT NULL,
     is_verified INTEGER DEFAULT 0,
     role TEXT NOT NULL
-);
\ No newline at end of file
+);
+
+-- Report counts per (grain 'h'/'d', hour/day bucket, batch, location),
+-- kept current by the report_rollups_ai/_ad/_au triggers on reports
+CREATE TABLE IF NOT EXISTS report_rollups (
+    grain TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    batch_key TEXT NOT NULL,
+    location TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (grain, bucket, batch_key, location)
+) WITHOUT ROWID;
+
+-- Per-regulator "seen up to report id X" (see models.acknowledge_reports)
+CREATE TABLE IF NOT EXISTS admin_report_watermarks (
+    admin_id INTEGER PRIMARY KEY REFERENCES admin_users(id),
+    last_seen_id INTEGER NOT NULL DEFAULT 0,
+    seen_at TEXT DEFAULT (datetime('now'))
+);
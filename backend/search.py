@@ -0,0 +1,62 @@
+"""
+Full-text search over reports and drugs.
+
+Migration 5 creates FTS5 tables with the trigram tokenizer (reports_fts,
+drugs_fts), kept in sync with their content tables by triggers. Any
+substring of three or more characters, including a fragment of a batch
+number, becomes an index lookup ranked by bm25 instead of a
+leading-wildcard LIKE scan. Shorter terms fall back to LIKE, as does a
+database whose SQLite was built without FTS5.
+"""
+
+# A trigram index cannot answer a term shorter than one trigram
+MIN_FTS_TERM = 3
+
+FTS_TABLES = {"reports": "reports_fts", "drugs": "drugs_fts"}
+
+_available = {}  # table -> bool, per process
+
+
+def fts_available(conn, table: str) -> bool:
+    """
+    True if migration 5 created the FTS index for `table`.
+    """
+    if table not in _available:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (FTS_TABLES[table],)
+        ).fetchone()
+        _available[table] = row is not None
+    return _available[table]
+
+
+def match_expression(term: str) -> str:
+    """
+    Quote `term` as a single FTS5 phrase so user input is never parsed
+    as query syntax (AND/OR/NEAR, column filters, ...).
+    """
+    return '"' + term.replace('"', '""') + '"'
+
+
+def text_search(conn, table: str, term: str, columns):
+    """
+    SQL fragments that restrict `table` to rows matching `term`.
+
+    Returns (join, where, params, rank):
+      join  -- goes right after `FROM table` ("" for the LIKE fallback)
+      where -- predicate to AND into the WHERE clause ("" when using FTS)
+      params -- bind values for whichever fragment is non-empty; they come
+                before any other filter's params as long as the search is
+                the first predicate added
+      rank  -- ORDER BY expression, best match first (None for LIKE)
+    """
+    if len(term) >= MIN_FTS_TERM and fts_available(conn, table):
+        fts = FTS_TABLES[table]
+        join = (
+            f"JOIN (SELECT rowid AS hit_id, rank AS hit_rank FROM {fts}"
+            f" WHERE {fts} MATCH ?) AS hits ON hits.hit_id = {table}.id"
+        )
+        return join, "", [match_expression(term)], "hits.hit_rank"
+
+    where = "(" + " OR ".join(f"{table}.{c} LIKE ?" for c in columns) + ")"
+    return "", where, [f"%{term}%"] * len(columns), None
@@ -0,0 +1,141 @@
+"""
+Duplicate suppression for public report submissions.
+
+A submission is keyed by (batch, location, client fingerprint), where the
+fingerprint is a hash of the client address and User-Agent. A repeat of
+a key within REPORT_DEDUP_WINDOW seconds of its last submission is a
+duplicate, and each duplicate slides the window forward, so a client that
+keeps resubmitting stays suppressed. Duplicates never become new rows:
+"fold" mode adds them to the original report's duplicate_count, "reject"
+mode answers 429 before touching the database. A submission whose
+report failed to store does not suppress its retries.
+
+State is per worker process and bounded to REPORT_DEDUP_MAX_KEYS keys
+(least recently seen are dropped first).
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from backend.config import get_config
+
+# Load configuration
+cfg = get_config()
+
+DEDUP_MODES = ("fold", "reject", "off")
+if cfg.REPORT_DEDUP_MODE not in DEDUP_MODES:
+    # Fail at startup rather than treat a typo as "fold"
+    raise ValueError(f"Invalid REPORT_DEDUP_MODE {cfg.REPORT_DEDUP_MODE!r}; "
+                     f"expected one of {', '.join(DEDUP_MODES)}")
+
+
+def client_fingerprint(remote_addr, user_agent) -> str:
+    """
+    Short, non-reversible id for a client (raw addresses are not kept).
+    """
+    raw = f"{remote_addr or ''}\n{user_agent or ''}".encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+def submission_key(batch_key, location, fingerprint) -> tuple:
+    return (batch_key, (location or "").strip().lower(), fingerprint)
+
+
+def write_failed(future) -> bool:
+    """
+    True if the report behind `future` will never be stored.
+    """
+    return future.done() and (future.cancelled()
+                              or future.exception() is not None)
+
+
+class SubmissionThrottle:
+    """
+    Bounded sliding-window record of recent submissions.
+    """
+
+    def __init__(self, window: float, max_keys: int):
+        self.window = window
+        self.max_keys = max_keys
+        self._data = OrderedDict()  # key -> [last_seen, original Future]
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.folded = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def admit(self, key):
+        """
+        Record a submission of `key`. Returns (False, None) for a new one,
+        or (True, Future of the original report or None) for a duplicate.
+        A repeat of a submission whose report failed to store is new.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if (entry is not None and now - entry[0] < self.window
+                    and not (entry[1] is not None and write_failed(entry[1]))):
+                entry[0] = now
+                self._data.move_to_end(key)
+                if cfg.REPORT_DEDUP_MODE == "reject":
+                    self.rejected += 1
+                else:
+                    self.folded += 1
+                return True, entry[1]
+            self._data[key] = [now, None]
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            self.accepted += 1
+            return False, None
+
+    def attach(self, key, future):
+        """
+        Remember the writer Future of the report `key` was admitted for.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                entry[1] = future
+
+    def forget(self, key):
+        """
+        Drop `key`, e.g. when its report could not be queued or stored, so
+        a retry is not taken for a duplicate.
+        """
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.accepted -= 1
+
+    def retry_after(self, key) -> int:
+        """
+        Whole seconds until `key` may be submitted again.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return 0
+            return max(1, math.ceil(entry[0] + self.window - time.monotonic()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            suppressed = self.folded + self.rejected
+            seen = self.accepted + suppressed
+            return {
+                "mode": cfg.REPORT_DEDUP_MODE,
+                "window_seconds": self.window,
+                "keys": len(self._data),
+                "max_keys": self.max_keys,
+                "accepted": self.accepted,
+                "folded": self.folded,
+                "rejected": self.rejected,
+                "suppressed_ratio": round(suppressed / seen, 4) if seen else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+report_throttle = SubmissionThrottle(cfg.REPORT_DEDUP_WINDOW,
+                                     cfg.REPORT_DEDUP_MAX_KEYS)
@@ -0,0 +1,348 @@
+"""
+Single-writer executor.
+
+Request threads never write to SQLite themselves. Every mutation (drug
+registration, report intake, status updates) is a job `fn(conn, *args)`
+submitted to one writer thread per process, which hands back a Future.
+The writer drains its bounded queue in groups of up to WRITE_BATCH_SIZE
+jobs (or whatever arrives within WRITE_BATCH_WAIT_MS of the first one) and
+runs each group in one transaction, so a surge costs one write lock per
+group instead of one per request. In "durable" intake mode the writer
+runs with synchronous=FULL, so that is also one fsync per group; under
+WAL the default NORMAL does not fsync commits at all.
+
+Each job runs in its own SAVEPOINT: a job that raises is rolled back and
+its Future gets the exception, without disturbing the rest of the group.
+The group takes the write lock up front (BEGIN IMMEDIATE) and waits in
+SQLite's busy handler; only if that times out does the writer back off
+(exponential, jittered) and try again, for at most WRITE_LOCK_BUDGET
+seconds in all. Lock waits are recorded in stats().
+
+When the queue is full, submit() raises QueueFull so callers can shed load.
+call() cancels a job that has not started within WRITE_TIMEOUT and raises
+WriteTimeout; a job that already started is waited for, so a caller is
+never told "failed" about a write that later commits. Both are
+WriteUnavailable: nothing was written, retry later. If the writer's
+connection breaks, the jobs in hand fail and the next group reconnects.
+"""
+
+import atexit
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from backend.config import get_config
+from backend.database import connect
+
+# Load configuration
+cfg = get_config()
+
+_STOP = object()
+
+
+class WriteUnavailable(Exception):
+    """
+    The write was not done and can be retried later.
+    """
+
+
+class QueueFull(WriteUnavailable):
+    """
+    The write queue is at capacity; retry later.
+    """
+
+
+class WriteTimeout(WriteUnavailable):
+    """
+    The job did not start within the caller's timeout and was cancelled.
+    """
+
+
+def _is_locked(error: sqlite3.Error) -> bool:
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+class WriteExecutor:
+    """
+    Per-process queue plus writer thread for all database mutations.
+    """
+
+    def __init__(self, db_path, max_queue: int, batch_size: int,
+                 max_wait: float, lock_retries: int, lock_budget: float,
+                 backoff_base: float, backoff_max: float):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.lock_retries = lock_retries
+        self.lock_budget = lock_budget
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.jobs = 0
+        self.largest_batch = 0
+        self.rejected = 0
+        self.failed = 0
+        self.lock_wait_total = 0.0
+        self.lock_wait_max = 0.0
+        self.lock_backoffs = 0
+        self.reconnects = 0
+
+    # ---------------------------
+    # Producer side
+    # ---------------------------
+
+    def _ensure_started(self):
+        # Started lazily so each forked worker gets its own thread
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self._queue.maxsize)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run,
+                                            name="db-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, fn, *args) -> Future:
+        """
+        Queue `fn(conn, *args)` for the writer thread. The returned Future
+        resolves to fn's return value once its transaction has committed,
+        or to the exception fn raised (its changes rolled back).
+        Raises QueueFull if the queue is at capacity.
+        """
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((fn, args, future))
+        except queue.Full:
+            self.rejected += 1
+            raise QueueFull() from None
+        return future
+
+    def call(self, fn, *args, timeout=None):
+        """
+        submit() and wait for the result (re-raising fn's exception).
+        Raises WriteTimeout if the job had not started within `timeout`
+        (it is cancelled, so it will not run later).
+        """
+        future = self.submit(fn, *args)
+        try:
+            return future.result(
+                timeout=cfg.WRITE_TIMEOUT if timeout is None else timeout)
+        except FutureTimeout:
+            if future.cancel():
+                raise WriteTimeout() from None
+        # Already running: its group is past the write lock, so this is short
+        return future.result()
+
+    def close(self, timeout: float = 5.0):
+        """
+        Flush what is queued and stop the writer thread.
+        """
+        if self._thread is None or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    # ---------------------------
+    # Writer thread
+    # ---------------------------
+
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is _STOP:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = (self._queue.get(timeout=remaining) if remaining > 0
+                        else self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # finish this batch, then stop
+                break
+            batch.append(item)
+        return batch
+
+    def _connect(self):
+        # Autocommit mode: transactions and savepoints are managed here
+        conn = connect(self.db_path, isolation_level=None,
+                       check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if cfg.REPORT_INTAKE_MODE == "durable":
+            # Under WAL, NORMAL does not fsync on commit: a report answered
+            # 201 could still be lost to a power cut. Readers keep NORMAL.
+            conn.execute("PRAGMA synchronous = FULL")
+        self._busy_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        return conn
+
+    def _fail(self, batch, error) -> int:
+        """
+        Give `error` to every Future in `batch` not already resolved.
+        """
+        failed = 0
+        for _, _, future in batch:
+            if future.done():
+                continue
+            # Claim a job not reached yet, unless its caller just cancelled it
+            if not future.running() and not future.set_running_or_notify_cancel():
+                continue
+            future.set_exception(error)
+            failed += 1
+        self.failed += failed
+        return failed
+
+    def _drain(self, error):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                self._fail([item], error)
+
+    def _run(self):
+        conn = None
+        batch = []
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                try:
+                    if conn is None:
+                        conn = self._connect()
+                    self._run_batch(conn, batch)
+                except Exception as e:
+                    # Connecting or rolling back failed: the connection is
+                    # suspect, so fail the group and start the next afresh
+                    self._fail(batch, e)
+                    if conn is not None:
+                        self.reconnects += 1
+                        try:
+                            conn.close()
+                        except sqlite3.Error:
+                            pass
+                        conn = None
+        except BaseException as e:
+            # The thread is going down; nobody would resolve these
+            self._fail(batch, e)
+            self._drain(e)
+            raise
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _begin(self, conn):
+        """
+        Take the write lock, backing off between busy timeouts, for at most
+        lock_budget seconds.
+        """
+        deadline = time.monotonic() + self.lock_budget
+        try:
+            for attempt in range(self.lock_retries + 1):
+                remaining = deadline - time.monotonic()
+                wait_ms = int(min(self._busy_timeout, max(remaining, 0) * 1000))
+                conn.execute(f"PRAGMA busy_timeout = {wait_ms}")
+                started = time.monotonic()
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    return
+                except sqlite3.OperationalError as e:
+                    remaining = deadline - time.monotonic()
+                    if (not _is_locked(e) or attempt == self.lock_retries
+                            or remaining <= 0):
+                        raise
+                    self.lock_backoffs += 1
+                    delay = min(self.backoff_max,
+                                self.backoff_base * 2 ** attempt)
+                    time.sleep(min(remaining, random.uniform(delay / 2, delay)))
+                finally:
+                    waited = time.monotonic() - started
+                    self.lock_wait_total += waited
+                    self.lock_wait_max = max(self.lock_wait_max, waited)
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {self._busy_timeout}")
+
+    def _run_batch(self, conn, batch):
+        results = []
+        try:
+            self._begin(conn)
+            for fn, args, future in batch:
+                # Cancelled by a caller that stopped waiting (see call())
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT job")
+                try:
+                    value = fn(conn, *args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    results.append((future, None, e))
+                    continue
+                conn.execute("RELEASE job")
+                results.append((future, value, None))
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Nothing from this group was committed. Fail the Futures first:
+            # if ROLLBACK raises too, _run drops the connection.
+            self._fail(batch, e)
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return
+
+        self.batches += 1
+        self.jobs += len(results)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for future, value, error in results:
+            if error is not None:
+                self.failed += 1
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "largest_batch": self.largest_batch,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "lock_wait_total_ms": round(self.lock_wait_total * 1000, 3),
+            "lock_wait_max_ms": round(self.lock_wait_max * 1000, 3),
+            "lock_backoffs": self.lock_backoffs,
+            "reconnects": self.reconnects,
+        }
+
+
+writer = WriteExecutor(
+    cfg.DB_PATH,
+    max_queue=cfg.WRITE_QUEUE_SIZE,
+    batch_size=cfg.WRITE_BATCH_SIZE,
+    max_wait=cfg.WRITE_BATCH_WAIT_MS / 1000,
+    lock_retries=cfg.WRITE_LOCK_RETRIES,
+    lock_budget=cfg.WRITE_LOCK_BUDGET,
+    backoff_base=cfg.WRITE_BACKOFF_BASE,
+    backoff_max=cfg.WRITE_BACKOFF_MAX,
+)
+
+# Don't drop queued writes on a clean shutdown (matters for fast intake)
+atexit.register(writer.close)
@@ -0,0 +1,151 @@
+"""
+Benchmark for the drug exports.
+Run this from the project root:
+    python bench_exports.py                   # 20,000 drugs
+    python bench_exports.py 100000
+    python bench_exports.py 100000 --memory   # also peak Python memory
+
+Builds a throwaway database with that many drugs and reports, for each
+export, time taken and throughput (PDF pages or Word table rows per
+second). The Word export is also built the old way, one python-docx
+cell at a time, and checked to produce the same document.xml. With
+--memory each export runs a second time under tracemalloc (much slower)
+to record its peak; for the PDF that includes the output, which stays in
+memory up to EXPORT_SPOOL_MAX bytes.
+"""
+
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import date, timedelta
+from docx import Document
+
+_tmp = tempfile.mkdtemp()
+os.environ["DB_PATH"] = os.path.join(_tmp, "bench.db")
+
+from backend.database import connect  # noqa: E402
+from backend.migrations import migrate  # noqa: E402
+from backend.exports import (  # noqa: E402
+    drug_export_rows, write_drugs_pdf, write_drugs_docx, spooled_file,
+    DRUG_EXPORT_HEADER,
+)
+from backend.pagination import order_by  # noqa: E402
+
+BASE_QUERY = "FROM drugs WHERE 1=1"
+ORDER = order_by(("drugs.created_at", "drugs.id"))
+
+
+def seed(conn, count):
+    today = date.today()
+    conn.executemany(
+        """
+        INSERT INTO drugs (name, batch_number, batch_key, mfg_date, expiry_date, expiry_on, manufacturer)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (f"Drug {i % 500}" + (" & Sons <EU>" if i % 7 == 0 else "")
+             + (" " if i % 11 == 0 else ""), f"BN-{i:07d}", f"BN{i:07d}",
+             (today - timedelta(days=400)).isoformat(),
+             (today + timedelta(days=i % 90 - 30)).isoformat(),
+             (today + timedelta(days=i % 90 - 30)).isoformat(),
+             f"Manufacturer {i % 40}")
+            for i in range(count)
+        )
+    )
+    conn.commit()
+
+
+def measure(name, build, unit, memory=False):
+    """
+    Time `build()`, which returns (units produced, output bytes).
+    Returns the elapsed seconds.
+    """
+    started = time.perf_counter()
+    produced, size = build()
+    elapsed = time.perf_counter() - started
+    line = (f"{name:<12} {elapsed:8.2f}s  {produced:7d} {unit:<5} "
+            f"{produced / elapsed:10.1f} {unit}/s  {size / 1e6:7.2f} MB")
+    if memory:
+        tracemalloc.start()
+        build()
+        line += f"  peak {tracemalloc.get_traced_memory()[1] / 1e6:7.2f} MB"
+        tracemalloc.stop()
+    print(line)
+    return elapsed
+
+
+def bench_pdf(conn):
+    out = spooled_file()
+    try:
+        pages = write_drugs_pdf(
+            drug_export_rows(conn, BASE_QUERY, [], ORDER), out, "benchmark")
+        return pages, out.tell()
+    finally:
+        out.close()
+
+
+def bench_docx(conn, keep=None):
+    out = io.BytesIO()
+    rows = write_drugs_docx(
+        drug_export_rows(conn, BASE_QUERY, [], ORDER), out, "benchmark")
+    if keep is not None:
+        keep.append(out.getvalue())
+    return rows, out.tell()
+
+
+def bench_docx_cells(conn, keep=None):
+    """
+    The Word export as it was: every cell set through python-docx.
+    """
+    doc = Document()
+    doc.add_heading("Registered Drugs Report", 0)
+    table = doc.add_table(rows=1, cols=len(DRUG_EXPORT_HEADER))
+    table.style = "Table Grid"
+    for cell, title in zip(table.rows[0].cells, DRUG_EXPORT_HEADER):
+        cell.text = title
+    rows = 0
+    for row in drug_export_rows(conn, BASE_QUERY, [], ORDER):
+        cells = table.add_row().cells
+        for cell, value in zip(cells, row):
+            cell.text = str(value) if value is not None else "N/A"
+        rows += 1
+    doc.add_paragraph()
+    doc.add_paragraph("Generated on benchmark by Admin System")
+    out = io.BytesIO()
+    doc.save(out)
+    if keep is not None:
+        keep.append(out.getvalue())
+    return rows, out.tell()
+
+
+def document_xml(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        return z.read("word/document.xml")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    count = int(args[0]) if args else 20000
+    memory = "--memory" in sys.argv
+    migrate(os.environ["DB_PATH"])
+    conn = connect(os.environ["DB_PATH"])
+    conn.row_factory = sqlite3.Row
+    seed(conn, count)
+    print(f"{count} drugs")
+    measure("pdf", lambda: bench_pdf(conn), "pages", memory)
+
+    fast, slow = [], []
+    fast_time = measure("docx", lambda: bench_docx(conn, fast), "rows", memory)
+    slow_time = measure("docx (cells)", lambda: bench_docx_cells(conn, slow),
+                        "rows", memory)
+    same = document_xml(fast[0]) == document_xml(slow[0])
+    print(f"docx speedup {slow_time / fast_time:.1f}x, "
+          f"document.xml {'identical' if same else 'DIFFERS'}")
+    if not same:
+        sys.exit(1)
+    conn.close()
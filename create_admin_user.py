@@ -1,5 +1,6 @@
 import sqlite3
 from werkzeug.security import generate_password_hash
+from backend.database import connect  # applies Config.DB_PRAGMAS
 
 # Path to your SQLite database
 DB_PATH = "medguard.db"
@@ -40,7 +41,7 @@ def create_admin_user():
     password_hash = generate_password_hash(password)
 
     # Connect to DB and ensure table exists
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     conn.execute("""
     CREATE TABLE IF NOT EXISTS admin_users (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -1,25 +1,12 @@
-import sqlite3
+from backend.config import get_config
+from backend.migrations import migrate
 
-DB_PATH = "backend/database.db"  # adjust if needed
+DB_PATH = get_config().DB_PATH  # same DB the app uses
 
 
 def create_drugs_table():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS drugs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            batch_number TEXT UNIQUE NOT NULL,
-            mfg_date TEXT NOT NULL,
-            expiry_date TEXT NOT NULL,
-            manufacturer TEXT NOT NULL
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    # The drugs schema is managed by backend/migrations.py
+    migrate(DB_PATH)
     print("✅ 'drugs' table created or already exists.")
 
 
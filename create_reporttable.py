@@ -1,25 +1,12 @@
-import sqlite3
+from backend.config import get_config
+from backend.migrations import migrate
 
-DB_PATH = "backend/database.db"  # same DB as your drugs table
+DB_PATH = get_config().DB_PATH  # same DB the app uses
 
 
 def create_reports_table():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS reports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            drug_name TEXT,
-            batch_number TEXT NOT NULL,
-            location TEXT,
-            note TEXT,
-            reported_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    # The reports schema is managed by backend/migrations.py
+    migrate(DB_PATH)
     print("✅ 'reports' table created or already exists.")
 
 
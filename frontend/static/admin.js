@@ -66,7 +66,7 @@ document.addEventListener("DOMContentLoaded", () => {
   // =========================
   // Counterfeit Reports Click-to-Check
   // =========================
-  document.querySelectorAll(".report-row").forEach(row => {
+  function bindMarkChecked(row) {
     row.addEventListener("click", () => {
       const reportId = row.dataset.id;
       fetch(`/admin/reports/mark_checked/${reportId}`, {
@@ -88,5 +88,50 @@ document.addEventListener("DOMContentLoaded", () => {
           console.error("Failed to mark report as checked:", err);
         });
     });
-  });
+  }
+  document.querySelectorAll(".report-row").forEach(bindMarkChecked);
+
+  // =========================
+  // Live Report Updates (Server-Sent Events)
+  // =========================
+  const reportCount = document.getElementById("report-count");
+  const reportsBody = document.getElementById("reports-body");
+
+  function reportRow(report) {
+    const row = document.createElement("tr");
+    row.className = "report-row" + (report.status === 0 ? " new" : "");
+    row.dataset.id = report.id;
+    [report.id, report.drug_name || "-", report.batch_number,
+     report.location || "-", report.note || "-", report.reported_on].forEach(value => {
+      const cell = document.createElement("td");
+      cell.textContent = value;
+      row.appendChild(cell);
+    });
+    const statusCell = document.createElement("td");
+    const badge = document.createElement("span");
+    badge.className = "badge " + (report.status === 0 ? "badge-new" : "badge-checked");
+    badge.textContent = report.status === 0 ? "New" : "Checked";
+    statusCell.appendChild(badge);
+    row.appendChild(statusCell);
+    bindMarkChecked(row);
+    return row;
+  }
+
+  if (reportCount && window.EventSource) {
+    const events = new EventSource("/admin/events");
+    events.addEventListener("reports", e => {
+      const data = JSON.parse(e.data);
+      reportCount.textContent = data.unread;
+      // Filtered or older pages: new reports don't belong on top
+      if (!reportsBody || !("live" in reportsBody.dataset)) return;
+      data.reports.forEach(report => {
+        if (reportsBody.querySelector(`.report-row[data-id="${report.id}"]`)) return;
+        const empty = reportsBody.querySelector("td[colspan]");
+        if (empty) empty.parentElement.remove();
+        reportsBody.prepend(reportRow(report));
+      });
+    });
+    // Session expired or logged out: stop reconnecting
+    document.addEventListener("sessionExpired", () => events.close());
+  }
 });
@@ -94,7 +94,7 @@ function showResult(data) {
   } else if (data.status === "expired") {
     statusClass = "result-expired";
     statusText = "⚠️ Expired";
-  } else if (data.status === "counterfeit") {
+  } else if (data.status === "counterfeit" || data.status === "notfound") {
     statusClass = "result-counterfeit";
     statusText = "❌ Counterfeit";
   } else {
@@ -133,8 +133,12 @@ function reportCounterfeit() {
       note
     })
   })
-    .then(res => res.json())
-    .then(data => {
+    .then(res => res.json().then(data => ({ ok: res.ok, data })))
+    .then(({ ok, data }) => {
+      if (!ok) {
+        showMessage(data.message || "Error submitting report", "error");
+        return;
+      }
       showMessage(data.message || "Report submitted successfully", "success");
     })
     .catch(err => {
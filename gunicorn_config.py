@@ -3,10 +3,24 @@ import multiprocessing
 # Number of workers (e.g., 2 * CPU cores + 1)
 workers = multiprocessing.cpu_count() * 2 + 1
 
+# Threads per worker (gthread). Admin dashboards hold a Server-Sent Events
+# stream open (up to SSE_MAX_SECONDS), which would otherwise pin a whole
+# sync worker each.
+threads = 4
+
 # Bind to all interfaces on port 8000
 bind = "0.0.0.0:8000"
 
 
+def on_starting(server):
+    # Run schema migrations once in the master, before workers boot;
+    # each worker's init_db() then finds the schema current.
+    from backend.migrations import migrate
+    versions = migrate()
+    if versions:
+        server.log.info("Applied schema migrations: %s", versions)
+
+
 def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %d)", worker.pid)
 
@@ -1,27 +1,14 @@
-import sqlite3
+from backend.config import get_config
+from backend.migrations import migrate
 
-DB_PATH = "backend/database.db"  # adjust if your DB file is elsewhere
-
-
-def column_exists(cursor, table_name, column_name):
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    columns = [row[1] for row in cursor.fetchall()]
-    return column_name in columns
+DB_PATH = get_config().DB_PATH  # same DB the app uses
 
 
 def add_mfg_date_column():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    if column_exists(c, "drugs", "mfg_date"):
-        print("✅ 'mfg_date' column already exists. No changes made.")
-    else:
-        print("🔄 Adding 'mfg_date' column to 'drugs' table...")
-        c.execute("ALTER TABLE drugs ADD COLUMN mfg_date TEXT")
-        conn.commit()
-        print("✅ 'mfg_date' column added successfully.")
-
-    conn.close()
+    # 'mfg_date' is part of migration 1 (base schema); see backend/migrations.py
+    versions = migrate(DB_PATH)
+    print(f"✅ Applied migrations {versions}." if versions
+          else "✅ 'mfg_date' column already exists. No changes made.")
 
 
 if __name__ == "__main__":
@@ -1,11 +1,11 @@
-import sqlite3
 from werkzeug.security import check_password_hash
+from backend.database import connect  # applies Config.DB_PRAGMAS
 
 DB_PATH = "medguard.db"  # adjust if your DB file is elsewhere
 
 
 def list_admins():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cursor = conn.execute(
         "SELECT id, company_name, email, password_hash, role, is_verified FROM admin_users"
     )
@@ -30,7 +30,7 @@ def list_admins():
 
 def test_password(email, password):
     """Check if the given password matches the stored hash for this email."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cursor = conn.execute(
         "SELECT password_hash FROM admin_users WHERE email = ?", (email.lower(
         ),)